@@ -1,35 +1,42 @@
 import bpy
 import mathutils
-from mathutils import Vector
+import numpy as np
+import argparse
+import json
+import os
+import sys
 import time
-def calculate_bone_midpoint(bone):
-    """Calculate the midpoint of a given bone."""
-    head = boneQ.head
-    tail = bone.tail
-    midpoint = (head + tail) / 2
-    return midpoint
-
-def bone_length(bone):
-    """Calculate the length of a given bone."""
-    return (bone.head - bone.tail).length
-
-def is_point_in_bone_bounds(point, bone):
-    """Check if a point is within the bounds of a bone."""
-    head = bone.head
-    tail = bone.tail
-    bone_direction = tail - head
-    point_direction = point - head
-    projection = point_direction.project(bone_direction)
-    projected_point = head + projection
-    return (projected_point - head).length <= bone_length(bone)
-
-def go_to_pose_mode(context, armature):
-    context.view_layer.objects.active = armature
-    bpy.ops.object.mode_set(mode='POSE')
-
-def go_to_edit_mode(armature):
-    bpy.context.view_layer.objects.active = armature
-    bpy.ops.object.mode_set(mode='EDIT')
+
+# Sibling modules live next to this file; inside Blender's text editor they
+# are imported from text blocks of the same name instead.
+_here = os.path.dirname(os.path.abspath(globals().get("__file__", "")))
+if os.path.isdir(_here) and _here not in sys.path:
+    sys.path.append(_here)
+
+from rigweights import solve_distance_weights, solve_many
+import rigplan
+from rigplan import DirectionalBoneIndex
+import rigprofile
+
+# Number of real object mode switches since the last reset_mode_switch_count().
+mode_switch_count = 0
+
+def reset_mode_switch_count():
+    global mode_switch_count
+    mode_switch_count = 0
+
+def set_object_mode(mode):
+    """Switch the active object to the given mode, skipping no-op switches.
+
+    Every real switch rebuilds the armature's edit bones, so the switches are
+    counted for benchmarking.
+    """
+    global mode_switch_count
+    active = bpy.context.view_layer.objects.active
+    if active is None or active.mode == mode:
+        return
+    bpy.ops.object.mode_set(mode=mode)
+    mode_switch_count += 1
 
 def safe_string(s):
     try:
@@ -37,143 +44,277 @@ def safe_string(s):
     except UnicodeDecodeError as e:
         print(f"Encoding error: {e}, in string: {repr(s)}")
         return ''.join([c if ord(c) < 128 else '?' for c in s])
-def verify_bone_hierarchy(operator, armature):
-    def report_hierarchy(bone, level=0):
-        operator.report({'INFO'}, "|  " * level + "+- " + bone.name)
-        for child in bone.children:
-            report_hierarchy(child, level + 1)
-
-    root_bones = [bone for bone in armature.data.bones if not bone.parent]
-    for root in root_bones:
-        report_hierarchy(root)
-def sort_and_parent(operator,context, armature):
-    
-   
-    safe_report(operator, {'INFO'}, "sort_and_parent")
-    armature = bpy.context.active_object
-    if armature.type != 'ARMATURE':
-        return
-    # Enter edit mode on the armature
-    context.view_layer.objects.active = armature
-    bpy.ops.object.mode_set(mode='EDIT')
-    
-    sorted_bones = sorted(armature.data.edit_bones, key=lambda b: b.head.y)
-    # Find the root bone (no parent)
-    existing_root = next((bone for bone in armature.data.edit_bones if not bone.parent), None)
-    
-    
-    for i, child_bone in enumerate(sorted_bones):
-        if i == 0 and existing_root:
-            child_bone.parent = existing_root
-            #armature.data.edit_bones.link(child_bone)
-        elif i > 0:
-            child_bone.parent = sorted_bones[i-1]
-            #armature.data.edit_bones.link(child_bone, parent=sorted_bones[i-1])
-        child_bone.use_connect = False
-    
-    bpy.ops.object.mode_set(mode='OBJECT')
-    
-    
-    
-    
-    
-    
-    
-    def report_hierarchy(bone, level=0):
-        operator.report({'INFO'}, "|  " * level + "-- " + bone.name)
-        for child in bone.children:
-            report_hierarchy(child, level + 1)
-
-    root_bones = [bone for bone in armature.data.bones if not bone.parent]
-    for root in root_bones:
-        report_hierarchy(root)
-def get_bone_parenting_chain(bone):
-    """Get the parenting chain of a bone back to the root."""
-    chain = []
-    while bone:
-        chain.append(bone.name)
-        bone = bone.parent
-    return " -> ".join(reversed(chain))
-
-def find_potential_parent(armature, child_bone, bones):
-    """Find a potential parent for a given bone."""
-    child_midpoint = calculate_bone_midpoint(child_bone)
-    potential_parents = [
-        bone for bone in bones 
-        if bone != child_bone and is_point_in_bone_bounds(child_midpoint, bone)
-    ]
-    if potential_parents:
-        return max(potential_parents, key=bone_length)
-    return None
-def parent_bones_handler(sorted_bones):
-    safe_report(operator, {'INFO'}, "handler")
-    armature = bpy.context.active_object
-    if armature.type != 'ARMATURE':
-        return
-    
-    # Check if the armature is in edit mode
-    if bpy.context.mode != 'EDIT_ARMATURE':
-        bpy.ops.object.mode_set(mode='EDIT')
-    
-    # Find the root bone (no parent)
-    existing_root = next((bone for bone in armature.data.edit_bones if not bone.parent), None)
-    
-    # Assume sorted_bones are globally available or passed via handler argument
-    for i, child_bone in enumerate(sorted_bones):
-        if i == 0 and existing_root:
-            child_bone.parent = existing_root
-        elif i > 0:
-            child_bone.parent = sorted_bones[i-1]
-        child_bone.use_connect = False
-    
-    bpy.ops.object.mode_set(mode='OBJECT')
-    
-    # Remove handler after execution
-    #bpy.app.handlers.depsgraph_update_post.remove(parent_bones_handler)
-    print("Bones parented successfully.")
+# Indentation stops growing past this depth, the level is printed instead
+HIERARCHY_MAX_INDENT = 32
+
+def check_hierarchy(names, parents):
+    """
+    Build and validate a bone tree from parent indices in one iterative pass.
+
+    :param names: Bone names
+    :param parents: Parent index per bone, None for roots
+    :return: (tree lines, summary dict with roots, orphans, cyclic, duplicates and depth stats)
+    """
+    children = [[] for _ in names]
+    roots = []
+    for i, parent in enumerate(parents):
+        if parent is None:
+            roots.append(i)
+        else:
+            children[parent].append(i)
+
+    depths = [-1] * len(names)
+    lines = []
+    stack = [(root, 0) for root in reversed(roots)]
+    while stack:
+        i, level = stack.pop()
+        depths[i] = level
+        indent = "|  " * min(level, HIERARCHY_MAX_INDENT)
+        prefix = f"[{level}] " if level > HIERARCHY_MAX_INDENT else ""
+        lines.append(f"{indent}+- {prefix}{names[i]}")
+        stack.extend((child, level + 1) for child in reversed(children[i]))
+
+    seen = set()
+    duplicates = sorted({name for name in names if name in seen or seen.add(name)})
+    reached = [depth for depth in depths if depth >= 0]
+    return lines, {
+        "bones": len(names),
+        "roots": [names[i] for i in roots],
+        # Extra roots besides the first, bones that ended up without a parent
+        "orphans": [names[i] for i in roots[1:]],
+        # Never reached from a root: on a parent cycle or below one
+        "cyclic": [names[i] for i, depth in enumerate(depths) if depth < 0],
+        "duplicates": duplicates,
+        "max_depth": max(reached) if reached else 0,
+        "mean_depth": sum(reached) / len(reached) if reached else 0.0,
+    }
+
+def verify_bone_hierarchy(operator, armature, text_name="Bonify Hierarchy"):
+    """Check the armature's hierarchy, write the tree to a Text datablock and report one summary."""
+    bones = armature.data.bones
+    names = [bone.name for bone in bones]
+    index = {name: i for i, name in enumerate(names)}
+    parents = [index[bone.parent.name] if bone.parent else None for bone in bones]
+    lines, summary = check_hierarchy(names, parents)
+
+    text = bpy.data.texts.get(text_name) or bpy.data.texts.new(text_name)
+    text.clear()
+    problems = [f"{key}: {', '.join(summary[key])}" for key in ("orphans", "cyclic", "duplicates") if summary[key]]
+    text.write("\n".join([f"{armature.name}: {summary['bones']} bones, max depth {summary['max_depth']}, "
+                          f"mean depth {summary['mean_depth']:.1f}"] + problems + [""] + lines) + "\n")
+
+    level = {'WARNING'} if problems else {'INFO'}
+    safe_report(operator, level, f"{summary['bones']} bones, {len(summary['roots'])} roots, "
+                                 f"max depth {summary['max_depth']}, {len(problems)} problems, "
+                                 f"tree in text '{text.name}'")
+    return summary
+
+# (armature data name, bone name) -> parenting chain text, dropped when the armature updates
+bone_chain_cache = {}
+
+def cached_bone_chain(armature, bone):
+    """Parenting chain of a bone back to the root as "Root -> ... -> Bone", reusing the cached chains of its ancestors."""
+    key = armature.data.name
+    missing = []
+    node = bone
+    while node is not None and (key, node.name) not in bone_chain_cache:
+        missing.append(node)
+        node = node.parent
+    chain = bone_chain_cache[(key, node.name)] if node is not None else ""
+    for node in reversed(missing):
+        chain = f"{chain} -> {node.name}" if chain else node.name
+        bone_chain_cache[(key, node.name)] = chain
+    return chain
+
+def plan_rig(context, armature, objects, full_length=False):
+    """Read the armature and objects into arrays and plan the rig with rigplan, in object mode."""
+    bones = armature.data.bones
+    names = [bone.name for bone in bones]
+    heads = np.array([bone.head_local for bone in bones], dtype=np.float64).reshape(-1, 3)
+    tails = np.array([bone.tail_local for bone in bones], dtype=np.float64).reshape(-1, 3)
+    root = next((i for i, bone in enumerate(bones) if not bone.parent), None)
+
+    meshes = [obj for obj in objects if obj.type == 'MESH']
+    with rigprofile.stage("bbox"):
+        centers, dims, wheels = analyze_objects(meshes)
+    to_armature = np.array(armature.matrix_world.inverted(), dtype=np.float64)
+
+    scene = context.scene
+    parent_name = scene.selected_parent_bone
+    parent = names.index(parent_name) if parent_name and parent_name in names else None
+    with rigprofile.stage("sorting"):
+        return rigplan.plan_rig(names, heads, tails, root, [obj.name for obj in meshes], centers, dims, wheels,
+                                to_armature, full_length, scene.main_chain_cutoff, parent, scene.selected_axes)
+
+def apply_rig_plan(armature, plan, weight_method=None):
+    """Write a RigPlan in a single edit session, then bind the objects in object mode."""
+    bpy.context.view_layer.objects.active = armature
+    with rigprofile.stage("mode switch"):
+        set_object_mode('EDIT')
+    with rigprofile.stage("bone creation"):
+        edit_bones = armature.data.edit_bones
+        bones = [edit_bones[name] for name in plan.names[:plan.existing]]
+        new = slice(plan.existing, None)
+        for name, head, tail, roll in zip(plan.names[new], plan.heads[new], plan.tails[new], plan.rolls[new]):
+            bones.append(create_bone(armature, name, head, tail, roll))
+    with rigprofile.stage("parenting"):
+        for bone, parent in zip(bones, plan.parents):
+            if parent is not None:
+                bone.parent = bones[parent]
+                bone.use_connect = False
+    # Names can change on creation when they clash, read them before leaving edit mode
+    bone_names = [bone.name for bone in bones[plan.existing:]]
+    with rigprofile.stage("mode switch"):
+        set_object_mode('OBJECT')
+
+    objects = [bpy.data.objects[name] for name in plan.sources]
+    with rigprofile.stage("weighting"):
+        if weight_method == 'DISTANCE':
+            for obj in objects:
+                ensure_armature_modifier(obj, armature)
+            assign_distance_weights_many(objects, armature)
+            return bone_names
+        evaluate_pose(weight_method)
+        for obj, bone_name in zip(objects, bone_names):
+            assign_object_weights(obj, armature, bone_name, weight_method)
+    return bone_names
 
 def bones_algorithm(operator, context, armature, objects, full_length=False):
-    
-    sorted_bones = []
-    
-    def create_and_sort_bones(objects, armature):
-        new_bones = []
-        for obj in objects:
-            if obj.type != 'MESH':
+    """Plan the rig, then apply it. Synchronous, so it also runs under blender -b."""
+    plan = plan_rig(context, armature, objects, full_length)
+    bone_names = apply_rig_plan(armature, plan, context.scene.weight_method)
+    record_rig_sources(armature, [bpy.data.objects[name] for name in plan.sources], bone_names)
+    safe_report(operator, {'INFO'}, f"Created and parented {len(bone_names)} bones.")
+    return bone_names
+
+# Armature custom property mapping source object name -> {"bone": name, "fingerprint": hex}
+RIG_RECORDS_KEY = "bonify_sources"
+
+def transform_fingerprint(obj):
+    """Rounded world matrix and local bounds of an object, stable across sessions, as a hex string."""
+    values = [round(value, 5) for row in obj.matrix_world for value in row]
+    values += [round(value, 5) for corner in obj.bound_box for value in corner]
+    # A string, because the 64 bit hash doesn't fit the 32 bit ints ID properties hold
+    return format(hash(tuple(values)) & 0xFFFFFFFFFFFFFFFF, "x")
+
+def load_rig_records(armature):
+    records = armature.get(RIG_RECORDS_KEY)
+    if not records:
+        return {}
+    return {name: (record["bone"], record["fingerprint"]) for name, record in records.to_dict().items()}
+
+def save_rig_records(armature, records):
+    armature[RIG_RECORDS_KEY] = {name: {"bone": bone, "fingerprint": fingerprint}
+                                 for name, (bone, fingerprint) in records.items()}
+
+def record_rig_sources(armature, objects, bone_names):
+    records = load_rig_records(armature)
+    for obj, bone_name in zip(objects, bone_names):
+        records[obj.name] = (bone_name, transform_fingerprint(obj))
+    save_rig_records(armature, records)
+
+def update_rig(operator, context, armature, objects, full_length=False):
+    """
+    Regenerate only what changed since the last run.
+
+    Bones of objects that moved are moved, objects without a bone get one and
+    bones whose object is gone are removed. Parents are planned for the whole
+    rig but only written where they differ, so untouched subtrees stay as they are.
+
+    :return: Names of the new bones
+    """
+    scene = context.scene
+    meshes = [obj for obj in objects if obj.type == 'MESH']
+    records = load_rig_records(armature)
+    bones = armature.data.bones
+    with rigprofile.stage("bbox"):
+        fingerprints = {obj.name: transform_fingerprint(obj) for obj in meshes}
+    alive = set()
+    for name in records:
+        obj = bpy.data.objects.get(name)
+        if obj is not None and obj.users_scene:
+            alive.add(name)
+    unchanged, changed, new, removed = rigplan.classify_sources(records, fingerprints, set(bones.keys()), alive)
+    for name in set(records) - alive:
+        del records[name]
+    if not changed and not new and not removed:
+        save_rig_records(armature, records)
+        safe_report(operator, {'INFO'}, f"Rig is up to date ({len(unchanged)} objects unchanged)")
+        return []
+
+    by_name = {obj.name: obj for obj in meshes}
+    moved = [by_name[name] for name in changed] + [by_name[name] for name in new]
+    with rigprofile.stage("bbox"):
+        _, moved_heads, moved_tails = compute_bone_placements(moved, armature, full_length)
+
+    # Final bone set: the armature minus removed bones, with moved bones at their new place, then new bones
+    removed_bones = set(removed.values())
+    kept = [bone for bone in bones if bone.name not in removed_bones]
+    names = [bone.name for bone in kept]
+    heads = np.array([bone.head_local for bone in kept], dtype=np.float64).reshape(-1, 3)
+    tails = np.array([bone.tail_local for bone in kept], dtype=np.float64).reshape(-1, 3)
+    position = {name: i for i, name in enumerate(names)}
+    for j, bone_name in enumerate(changed.values()):
+        heads[position[bone_name]] = moved_heads[j]
+        tails[position[bone_name]] = moved_tails[j]
+    existing = len(names)
+    names += new
+    heads = np.concatenate((heads, moved_heads[len(changed):]))
+    tails = np.concatenate((tails, moved_tails[len(changed):]))
+    root = next((i for i, bone in enumerate(kept) if not bone.parent), None)
+
+    parent_name = scene.selected_parent_bone
+    parent = names.index(parent_name) if parent_name and parent_name in names[:existing] else None
+    with rigprofile.stage("sorting"):
+        parents = rigplan.plan_hierarchy(heads, tails, root, scene.main_chain_cutoff, parent, scene.selected_axes)
+
+    bpy.context.view_layer.objects.active = armature
+    with rigprofile.stage("mode switch"):
+        set_object_mode('EDIT')
+    edit_bones = armature.data.edit_bones
+    with rigprofile.stage("bone creation"):
+        for bone_name in removed_bones:
+            edit_bones.remove(edit_bones[bone_name])
+        for j, bone_name in enumerate(changed.values()):
+            edit_bones[bone_name].head = moved_heads[j]
+            edit_bones[bone_name].tail = moved_tails[j]
+        edit = [edit_bones[name] for name in names[:existing]]
+        for name, head, tail in zip(new, heads[existing:], tails[existing:]):
+            edit.append(create_bone(armature, name, head, tail))
+    reparented = 0
+    with rigprofile.stage("parenting"):
+        for bone, parent_index in zip(edit, parents):
+            if parent_index is None:
                 continue
-            bone = add_bone_to_object(obj, armature, full_length)
-            if bone:
-                new_bones.append(bone)
-        time.sleep(.02)
-        # Print information about bones before sorting
-        #safe_report(operator, {'INFO'}, "Bones before sorting:")
-        #for i, bone in enumerate(new_bones):
-        #    safe_report(operator, {'INFO'}, f"Bone {i}: Name: {bone.name}, Head Y: {bone.head.y:.4f}")
-        bpy.context.view_layer.update()
-        sorted_bones = sorted(new_bones, key=lambda b: b.head.y)
-        
-        # Print information about bones after sorting
-        #safe_report(operator, {'INFO'}, "Bones after sorting:")
-        #for i, bone in enumerate(sorted_bones):
-            #safe_report(operator, {'INFO'}, f"Bone {i}: Name: {bone.name}, Head Y: {bone.head.y:.4f}")
-        
-        return sorted_bones
+            target = edit[parent_index]
+            if bone.parent is None or bone.parent.name != target.name:
+                bone.parent = target
+                bone.use_connect = False
+                reparented += 1
+    new_names = [bone.name for bone in edit[existing:]]
+    with rigprofile.stage("mode switch"):
+        set_object_mode('OBJECT')
+
+    bound = list(zip(moved, list(changed.values()) + new_names))
+    with rigprofile.stage("weighting"):
+        if scene.weight_method == 'DISTANCE':
+            for obj in moved:
+                ensure_armature_modifier(obj, armature)
+            assign_distance_weights_many(moved, armature)
+        else:
+            evaluate_pose(scene.weight_method)
+            for obj, bone_name in bound:
+                assign_object_weights(obj, armature, bone_name, scene.weight_method)
+
+    for name in removed:
+        records.pop(name, None)
+    for obj, bone_name in bound:
+        records[obj.name] = (bone_name, fingerprints[obj.name])
+    save_rig_records(armature, records)
+    safe_report(operator, {'INFO'}, f"Updated rig: {len(new)} added, {len(changed)} moved, {len(removed)} removed, "
+                                    f"{reparented} re-parented, {len(unchanged)} unchanged")
+    return new_names
 
-    try:
-        bpy.context.view_layer.objects.active = armature
-        sorted_bones = create_and_sort_bones(objects, armature)
-        bpy.context.view_layer.update()
-        
-        if sorted_bones:#this doesn't work, but lets see if it works
-            def delayed_parent_bones():
-                safe_report(operator, {'INFO'}, "Parenting bones...")
-                parent_bones_handler(sorted_bones, armature)  # Pass armature argument
-                return None
-            bpy.app.timers.register(delayed_parent_bones, first_interval=0.01)
-
-        safe_report(operator, {'INFO'}, "Parenting operation initiated.")
-    except Exception as e:
-        safe_report(operator, {'ERROR'}, f"Error during bone creation and sorting: {str(e)}")
 def create_bone(armature, name, head, tail, roll=0):
     """
     Create a new bone in the given armature.
@@ -198,63 +339,314 @@ def safe_report(operator, level, message):
         print(f"Encoding error in report message: {e}, message: {repr(message)}")
         operator.report({'ERROR'}, f"Encoding error in report message: {str(e)}")
 
-def is_wheel(obj):
+def world_bounds(objects):
+    """World space bounding boxes of objects, see rigplan.world_bounds."""
+    corners = np.array([obj.bound_box for obj in objects], dtype=np.float64).reshape(-1, 8, 3)
+    matrices = np.array([obj.matrix_world for obj in objects], dtype=np.float64).reshape(-1, 4, 4)
+    return rigplan.world_bounds(corners, matrices)
+
+def wheel_mask(dimensions):
+    """Wheel shaped dimensions, when wheel checking is on for the scene."""
     if not bpy.context.scene.check_for_wheels:
-        return False
-    world_bbox = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-    dimensions = Vector((
-        max(v.x for v in world_bbox) - min(v.x for v in world_bbox),
-        max(v.y for v in world_bbox) - min(v.y for v in world_bbox),
-        max(v.z for v in world_bbox) - min(v.z for v in world_bbox)
-    ))
-    return abs(dimensions.x - dimensions.z) < 0.001 and dimensions.y < min(dimensions.x, dimensions.z)
-
-def add_bone_to_object(obj, armature, full_length=False):
-    try:
-        if obj is None or armature is None:
-            print("Invalid object or armature")
-            return None
+        return np.zeros(len(dimensions), dtype=bool)
+    return rigplan.wheel_shape_mask(dimensions)
 
-        bpy.context.view_layer.objects.active = armature
-        bpy.ops.object.mode_set(mode='EDIT')
+# Per-object analysis reused across Add Bone / Generate Rig runs in a session.
+# Object name -> (fingerprint, world center, world dimensions, wheel shaped)
+analysis_cache = {}
 
-        world_bbox = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-        world_center = sum(world_bbox, Vector()) / 8
-        world_dims = Vector((
-            max(v.x for v in world_bbox) - min(v.x for v in world_bbox),
-            max(v.y for v in world_bbox) - min(v.y for v in world_bbox),
-            max(v.z for v in world_bbox) - min(v.z for v in world_bbox)
-        ))
+def object_fingerprint(obj, check_wheels):
+    """
+    Cheap change check on exactly what the analysis reads: data pointer, bounds, world matrix and the wheel toggle.
 
-        obj_loc = armature.matrix_world.inverted() @ world_center
+    bonify's own binds (modifiers, vertex groups, parenting) leave it alone.
+    """
+    data = obj.data
+    matrix = tuple(value for row in obj.matrix_world for value in row)
+    bounds = tuple(value for corner in obj.bound_box for value in corner)
+    return (data.as_pointer() if data else 0, hash(bounds), hash(matrix), bool(check_wheels))
 
-        if is_wheel(obj):
-            bone_length = max(world_dims.x, world_dims.z)
-            bone_dir = Vector((0, 0, 1))  # Use Z-axis for wheels
-        else:
-            bone_length = world_dims.y
-            bone_dir = Vector((0, 1, 0))  # Use Y-axis for non-wheels
+def analyze_objects(objects):
+    """
+    World centers, dimensions and wheel classification for objects.
+
+    Objects whose fingerprint still matches come from analysis_cache, only the
+    rest go through world_bounds.
 
-        if full_length:
-            head = obj_loc - (bone_dir * bone_length / 2)
-            tail = obj_loc + (bone_dir * bone_length / 2)
+    :return: (centers, dimensions, wheels), (n, 3), (n, 3) and (n,) arrays
+    """
+    count = len(objects)
+    centers = np.zeros((count, 3))
+    dims = np.zeros((count, 3))
+    wheels = np.zeros(count, dtype=bool)
+    check_wheels = bpy.context.scene.check_for_wheels
+    fingerprints = [object_fingerprint(obj, check_wheels) for obj in objects]
+
+    missing = []
+    for i, (obj, fingerprint) in enumerate(zip(objects, fingerprints)):
+        entry = analysis_cache.get(obj.name)
+        if entry is not None and entry[0] == fingerprint:
+            centers[i], dims[i], wheels[i] = entry[1], entry[2], entry[3]
         else:
-            head = obj_loc
-            tail = obj_loc + (bone_dir * bone_length)
+            missing.append(i)
+
+    if missing:
+        missing_centers, missing_dims, _, _ = world_bounds([objects[i] for i in missing])
+        missing_wheels = wheel_mask(missing_dims)
+        centers[missing] = missing_centers
+        dims[missing] = missing_dims
+        wheels[missing] = missing_wheels
+        for j, i in enumerate(missing):
+            analysis_cache[objects[i].name] = (fingerprints[i], missing_centers[j], missing_dims[j], bool(missing_wheels[j]))
+    return centers, dims, wheels
 
-        bone_name = obj.name
-        bone = create_bone(armature, bone_name, head, tail)
+@bpy.app.handlers.persistent
+def invalidate_analysis_cache(scene, depsgraph):
+    """
+    Drop cached analysis for objects whose geometry update changed what the analysis reads.
+
+    Each update is checked against the stored fingerprint, so bonify's own
+    binds, which don't move the bounds, keep their entries.
+    """
+    if not analysis_cache:
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and update.is_updated_geometry:
+            obj = update.id.original
+            entry = analysis_cache.get(obj.name)
+            if entry is not None and entry[0] != object_fingerprint(obj, scene.check_for_wheels):
+                del analysis_cache[obj.name]
+
+@bpy.app.handlers.persistent
+def invalidate_bone_chain_cache(scene, depsgraph):
+    """Drop cached chains of armatures that changed, their hierarchy may have too."""
+    changed = {update.id.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Armature)}
+    if changed:
+        for key in [key for key in bone_chain_cache if key[0] in changed]:
+            del bone_chain_cache[key]
+
+# Names of armature objects, kept up to date from depsgraph updates instead of
+# scanning bpy.data.objects on every panel redraw
+armature_registry = set()
+_registry_object_count = -1
+
+def rebuild_armature_registry():
+    global _registry_object_count
+    armature_registry.clear()
+    armature_registry.update(obj.name for obj in bpy.data.objects if obj.type == 'ARMATURE')
+    _registry_object_count = len(bpy.data.objects)
+
+def registered_armatures():
+    """Armature names from the registry, dropping any renamed away since they were added."""
+    if _registry_object_count < 0:
+        rebuild_armature_registry()
+    stale = [name for name in armature_registry
+             if getattr(bpy.data.objects.get(name), "type", None) != 'ARMATURE']
+    armature_registry.difference_update(stale)
+    return armature_registry
+
+@bpy.app.handlers.persistent
+def update_armature_registry(scene, depsgraph):
+    """Add armatures that show up in updates, rebuild only when objects were removed."""
+    global _registry_object_count
+    if _registry_object_count < 0:
+        return
+    count = len(bpy.data.objects)
+    if count < _registry_object_count:
+        rebuild_armature_registry()
+        return
+    _registry_object_count = count
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and update.id.type == 'ARMATURE':
+            armature_registry.add(update.id.name)
 
-        bpy.ops.object.mode_set(mode='OBJECT')
+@bpy.app.handlers.persistent
+def clear_session_caches(*args):
+    analysis_cache.clear()
+    bone_chain_cache.clear()
+    rebuild_armature_registry()
 
-        if not any(mod.type == 'ARMATURE' and mod.object == armature for mod in obj.modifiers):
-            armature_modifier = obj.modifiers.new(name="Armature", type='ARMATURE')
-            armature_modifier.object = armature
+def add_handler(handlers, handler):
+    """Append a handler, replacing one of the same name left by an earlier run of the script."""
+    remove_handler(handlers, handler)
+    handlers.append(handler)
 
-        vertex_group = obj.vertex_groups.new(name=bone_name)
-        vertex_group.add(range(len(obj.data.vertices)), 1.0, 'REPLACE')
+def remove_handler(handlers, handler):
+    for existing in [h for h in handlers if h.__name__ == handler.__name__]:
+        handlers.remove(existing)
+
+def compute_bone_placements(objects, armature, full_length=False):
+    """
+    Compute where the bone for each object goes, without touching edit mode.
+
+    :param objects: The mesh objects
+    :param armature: The armature object
+    :param full_length: Center the bones on the objects instead of starting at their centers
+    :return: (bone names, heads, tails), heads and tails as (n, 3) arrays in armature space
+    """
+    centers, dims, wheels = analyze_objects(objects)
+    to_armature = np.array(armature.matrix_world.inverted(), dtype=np.float64)
+    heads, tails, _ = rigplan.bone_placements(centers, dims, wheels, to_armature, full_length)
+    return [obj.name for obj in objects], heads, tails
+
+def evaluate_pose(weight_method):
+    """New bones get their pose matrices on the next evaluation, RIGID binds read them."""
+    if weight_method == 'RIGID':
+        bpy.context.view_layer.update()
+
+def parent_object_to_bone(obj, armature, bone_name):
+    """
+    Parent an object rigidly to a bone, keeping it where it is.
+
+    No modifier and no vertex group, so posing costs one matrix per object.
+    Reads the pose, so new bones need a view layer update first, see evaluate_pose.
+    """
+    for mod in [mod for mod in obj.modifiers if mod.type == 'ARMATURE' and mod.object == armature]:
+        obj.modifiers.remove(mod)
+    world = obj.matrix_world.copy()
+    pose_bone = armature.pose.bones[bone_name]
+    obj.parent = armature
+    obj.parent_type = 'BONE'
+    obj.parent_bone = bone_name
+    # Bone parents follow the posed bone, moved to its pose tail, like parent_set(type='BONE')
+    bone_matrix = pose_bone.matrix.copy()
+    bone_matrix.translation = pose_bone.tail
+    obj.matrix_parent_inverse = (armature.matrix_world @ bone_matrix).inverted()
+    obj.matrix_basis = world
 
-        return bone
+# Distinct weight values written per vertex group, one VertexGroup.add call each
+DISTANCE_WEIGHT_LEVELS = 256
+
+def read_armature_space_coords(obj, armature):
+    """Vertex positions of a mesh object in the armature's space, read in bulk."""
+    coords = np.empty(len(obj.data.vertices) * 3, dtype=np.float64)
+    obj.data.vertices.foreach_get("co", coords)
+    coords = coords.reshape(-1, 3)
+    to_armature = np.array(armature.matrix_world.inverted() @ obj.matrix_world, dtype=np.float64)
+    return coords @ to_armature[:3, :3].T + to_armature[:3, 3]
+
+def deform_bone_segments(armature):
+    """Names, heads and tails of the armature's deform bones in armature space."""
+    bones = [bone for bone in armature.data.bones if bone.use_deform]
+    heads = np.array([bone.head_local for bone in bones], dtype=np.float64).reshape(-1, 3)
+    tails = np.array([bone.tail_local for bone in bones], dtype=np.float64).reshape(-1, 3)
+    return [bone.name for bone in bones], heads, tails
+
+def write_vertex_weights(obj, bone_names, indices, weights, levels=DISTANCE_WEIGHT_LEVELS):
+    """
+    Write solved weights into vertex groups, replacing what they held.
+
+    Weights are quantized so every group needs one add call per distinct value
+    instead of one per vertex.
+    """
+    count = len(obj.data.vertices)
+    vertex_ids = np.repeat(np.arange(count), indices.shape[1])
+    bone_ids = indices.ravel()
+    steps = np.rint(weights.ravel() * (levels - 1)).astype(np.int32)
+    keep = steps > 0
+    vertex_ids, bone_ids, steps = vertex_ids[keep], bone_ids[keep], steps[keep]
+
+    order = np.lexsort((steps, bone_ids))
+    vertex_ids, bone_ids, steps = vertex_ids[order], bone_ids[order], steps[order]
+    # Boundaries of runs sharing the same bone and weight step
+    breaks = np.flatnonzero((np.diff(bone_ids) != 0) | (np.diff(steps) != 0)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(bone_ids)]))
+
+    for name in bone_names:
+        group = obj.vertex_groups.get(name)
+        if group is not None:
+            group.remove(range(count))
+    groups = {}
+    for bone_index in np.unique(bone_ids):
+        name = bone_names[bone_index]
+        groups[bone_index] = obj.vertex_groups.get(name) or obj.vertex_groups.new(name=name)
+    for start, end in zip(starts, ends):
+        groups[bone_ids[start]].add(vertex_ids[start:end].tolist(), steps[start] / (levels - 1), 'REPLACE')
+
+def assign_distance_weights(obj, armature):
+    """Weight a mesh to every deform bone of the armature with solve_distance_weights."""
+    bone_names, heads, tails = deform_bone_segments(armature)
+    if not bone_names or not len(obj.data.vertices):
+        return
+    coords = read_armature_space_coords(obj, armature)
+    indices, weights = solve_distance_weights(coords, heads, tails)
+    write_vertex_weights(obj, bone_names, indices, weights)
+
+def assign_distance_weights_many(objects, armature):
+    """
+    Distance weights for many meshes at once.
+
+    Vertex arrays and bone segments are exported as plain arrays, solved in
+    worker processes, and written back here on the main thread.
+    """
+    bone_names, heads, tails = deform_bone_segments(armature)
+    meshes = [obj for obj in objects if len(obj.data.vertices)]
+    if not bone_names or not meshes:
+        return
+    jobs = [(read_armature_space_coords(obj, armature), heads, tails) for obj in meshes]
+    for obj, (indices, weights) in zip(meshes, solve_many(jobs)):
+        write_vertex_weights(obj, bone_names, indices, weights)
+
+def ensure_armature_modifier(obj, armature):
+    if not any(mod.type == 'ARMATURE' and mod.object == armature for mod in obj.modifiers):
+        armature_modifier = obj.modifiers.new(name="Armature", type='ARMATURE')
+        armature_modifier.object = armature
+
+def assign_object_weights(obj, armature, bone_name, weight_method=None):
+    """Bind the whole object to one bone, in object mode.
+
+    RIGID parents the object to the bone, DISTANCE weights it against every
+    deform bone, anything else uses an Armature modifier and a vertex group
+    holding every vertex.
+    """
+    if weight_method == 'RIGID':
+        parent_object_to_bone(obj, armature, bone_name)
+        return
+    ensure_armature_modifier(obj, armature)
+    if weight_method == 'DISTANCE':
+        assign_distance_weights(obj, armature)
+        return
+
+    vertex_group = obj.vertex_groups.get(bone_name) or obj.vertex_groups.new(name=bone_name)
+    vertex_group.add(range(len(obj.data.vertices)), 1.0, 'REPLACE')
+
+def add_bone_to_object(obj, armature, full_length=False, parent_name="", axes=None, weight_method=None):
+    try:
+        if obj is None or armature is None:
+            print("Invalid object or armature")
+            return None
+
+        with rigprofile.stage("bbox"):
+            names, heads, tails = compute_bone_placements([obj], armature, full_length)
+
+        bpy.context.view_layer.objects.active = armature
+        with rigprofile.stage("mode switch"):
+            set_object_mode('EDIT')
+        with rigprofile.stage("bone creation"):
+            others = list(armature.data.edit_bones)
+            bone = create_bone(armature, names[0], heads[0], tails[0])
+            bone_name = bone.name
+
+        # Manually selected parent bone wins, otherwise the closest bone along the axes
+        with rigprofile.stage("parenting"):
+            parent = armature.data.edit_bones.get(parent_name) if parent_name else None
+            if parent is None and axes and others:
+                others_heads = np.array([other.head for other in others], dtype=np.float64)
+                parent_index = DirectionalBoneIndex(others_heads).nearest(heads[0], axes)
+                if parent_index is not None:
+                    parent = others[parent_index]
+            if parent is not None:
+                bone.parent = parent
+                bone.use_connect = False
+        with rigprofile.stage("mode switch"):
+            set_object_mode('OBJECT')
+
+        with rigprofile.stage("weighting"):
+            evaluate_pose(weight_method)
+            assign_object_weights(obj, armature, bone_name, weight_method)
+
+        return armature.data.bones[bone_name]
     except Exception as e:
         print(f"Error in add_bone_to_object: {e}")
         if bpy.context.mode != 'OBJECT':
@@ -270,6 +662,10 @@ class OBJECT_OT_add_bone(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.add_bone(context)
+
+    def add_bone(self, context):
         try:
             obj = context.object
             armature = context.scene.selected_armature
@@ -282,12 +678,15 @@ class OBJECT_OT_add_bone(bpy.types.Operator):
                     self.report({'WARNING'}, "Selected object is no longer valid.")
                     return {'CANCELLED'}
 
-                add_bone_to_object(obj, armature, full_length)
+                add_bone_to_object(obj, armature, full_length,
+                                   context.scene.selected_parent_bone, context.scene.selected_axes,
+                                   weight_method)
 
-                if weight_method == 'ENVELOPE':
-                    bpy.ops.object.parent_set(type='ARMATURE_ENVELOPE')
-                elif weight_method == 'AUTO':
-                    bpy.ops.object.parent_set(type='ARMATURE_AUTO')
+                with rigprofile.stage("weighting"):
+                    if weight_method == 'ENVELOPE':
+                        bpy.ops.object.parent_set(type='ARMATURE_ENVELOPE')
+                    elif weight_method == 'AUTO':
+                        bpy.ops.object.parent_set(type='ARMATURE_AUTO')
 
                 if go_to_pose_mode_flag:
                     bpy.ops.object.mode_set(mode='POSE')
@@ -303,6 +702,23 @@ class OBJECT_OT_add_bone(bpy.types.Operator):
             self.report({'ERROR'}, f"Error in add_bone_to_object: {str(e)}")
             return {'CANCELLED'}
 
+def generate_rig(operator, context, armature, objects, full_length=False):
+    """Generate Rig without the UI: plan, apply and verify. Returns (new bone names, hierarchy summary)."""
+    reset_mode_switch_count()
+    # Ensure we're in Object Mode before starting
+    set_object_mode('OBJECT')
+
+    if context.scene.incremental_rig:
+        # Only touches bones whose object changed since the last run
+        bone_names = update_rig(operator, context, armature, objects, full_length)
+    else:
+        # Creates and parents every bone in a single edit session
+        bone_names = bones_algorithm(operator, context, armature, objects, full_length)
+    # Verify the bone hierarchy
+    with rigprofile.stage("verify"):
+        summary = verify_bone_hierarchy(operator, armature)
+    return bone_names, summary
+
 class OBJECT_OT_generate_rig(bpy.types.Operator):
     bl_idname = "object.generate_rig"
     bl_label = "Generate Rig"
@@ -321,34 +737,15 @@ class OBJECT_OT_generate_rig(bpy.types.Operator):
             return {'CANCELLED'}
 
         try:
-            # Ensure we're in Object Mode before starting
-            bpy.ops.object.mode_set(mode='OBJECT')
-            
-            # Select the armature and enter Edit Mode
-            bpy.context.view_layer.objects.active = armature
-            bpy.ops.object.mode_set(mode='EDIT')
-            
-            bones_algorithm(self, context, armature, objects, full_length)
-            bpy.context.view_layer.objects.active = armature
-            bpy.ops.object.mode_set(mode='EDIT')
-            # Crucial: Apply the changes before exiting Edit Mode
-            #bpy.ops.armature.select_all(action='SELECT')
-            #bpy.ops.armature.parent_set(type='OFFSET')
-            
-            # Return to Object Mode
-            bpy.ops.object.mode_set(mode='OBJECT')
-            sort_and_parent(self,context, armature)
-            # Return to Object Mode
-            bpy.ops.object.mode_set(mode='OBJECT')
-            # Verify the bone hierarchy
-            verify_bone_hierarchy(self, armature)
+            with rigprofile.run(context, self.bl_idname):
+                generate_rig(self, context, armature, objects, full_length)
         except Exception as e:
             self.report({'ERROR'}, f"Error during rig generation: {str(e)}")
             if bpy.context.mode != 'OBJECT':
                 bpy.ops.object.mode_set(mode='OBJECT')
             return {'CANCELLED'}
 
-        self.report({'INFO'}, "Rig generated successfully")
+        self.report({'INFO'}, f"Rig generated successfully ({mode_switch_count} mode switches)")
         return {'FINISHED'}
 
 
@@ -362,9 +759,9 @@ class VIEW3D_PT_custom_panel(bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
         layout.label(text="Select Armature:")
-        for armature in bpy.data.objects:
-            if armature.type == 'ARMATURE':
-                layout.operator("object.select_armature", text=armature.name).armature_name = armature.name
+        selected = context.scene.selected_armature
+        layout.operator("object.select_armature", text=selected.name if selected else "Search Armatures",
+                        icon='ARMATURE_DATA')
 
         layout.label(text="Parent Bone:")
         row = layout.row(align=True)
@@ -381,33 +778,58 @@ class VIEW3D_PT_custom_panel(bpy.types.Panel):
         layout.prop(context.scene, "check_for_wheels", text="Check for Wheels")
         layout.prop(context.scene, "weight_method", text="Weight Method")
         layout.prop(context.scene, "main_chain_cutoff", text="Main Chain Cutoff (%)")
+        layout.prop(context.scene, "incremental_rig", text="Incremental Regenerate")
         layout.operator("object.add_bone", text="Add Bone", icon='BONE_DATA')
         layout.operator("object.generate_rig", text="Generate Rig")
         layout.operator("object.clear_all_bones_except_root", text="Clear All Bones Except Root", icon='BONE_DATA')
+        rigprofile.draw(layout, context)
 
         layout.label(text="Bone Chain:")
         obj = context.object
         if obj and obj.type == 'MESH' and obj.vertex_groups:
-            armature = context.scene.selected_armature
-            if armature:
-                for vgroup in obj.vertex_groups:
-                    bone_name = vgroup.name
-                    if bone_name in armature.data.bones:
-                        bone = armature.data.bones[bone_name]
-                        chain = get_bone_parenting_chain(bone)
-                        layout.label(text=f"{bone_name}: {chain}")
+            if context.scene.selected_armature:
+                # Only the visible rows are drawn
+                layout.template_list("OBJECT_UL_bone_chains", "", obj, "vertex_groups",
+                                     obj.vertex_groups, "active_index", rows=5)
         else:
             layout.label(text="No weight painted bones found")
 
+class OBJECT_UL_bone_chains(bpy.types.UIList):
+    """Vertex groups of the active mesh with the parenting chain of their bone."""
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        armature = context.scene.selected_armature
+        bone = armature.data.bones.get(item.name) if armature and armature.type == 'ARMATURE' else None
+        if bone:
+            layout.label(text=f"{item.name}: {cached_bone_chain(armature, bone)}", icon='BONE_DATA')
+        else:
+            layout.label(text=item.name, icon='GROUP_VERTEX')
+
+def armature_search_items(self, context):
+    global _armature_items
+    # Blender needs the item strings to stay referenced while the popup is open
+    _armature_items = [(name, name, "") for name in sorted(registered_armatures())]
+    return _armature_items
+
+_armature_items = []
+
 class OBJECT_OT_select_armature(bpy.types.Operator):
     bl_idname = "object.select_armature"
     bl_label = "Select Armature"
     bl_description = "Select an armature for adding bones"
+    bl_property = "armature"
 
     armature_name: bpy.props.StringProperty()
+    armature: bpy.props.EnumProperty(items=armature_search_items)
+
+    def invoke(self, context, event):
+        if self.armature_name:
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
 
     def execute(self, context):
-        armature = bpy.data.objects.get(self.armature_name)
+        armature = bpy.data.objects.get(self.armature_name or self.armature)
         if armature and armature.type == 'ARMATURE':
             context.scene.selected_armature = armature
             self.report({'INFO'}, f"Selected armature: {armature.name}")
@@ -454,6 +876,10 @@ class OBJECT_OT_clear_all_bones_except_root(bpy.types.Operator):
     bl_description = "Clear all bones from the selected armature except the root bone"
 
     def execute(self, context):
+        with rigprofile.run(context, self.bl_idname):
+            return self.clear_bones(context)
+
+    def clear_bones(self, context):
         armature = context.scene.selected_armature
         if armature and armature.type == 'ARMATURE':
             bpy.context.view_layer.objects.active = armature
@@ -461,9 +887,11 @@ class OBJECT_OT_clear_all_bones_except_root(bpy.types.Operator):
                 bpy.ops.object.mode_set(mode='EDIT')
             root_bone = next((bone for bone in armature.data.edit_bones if not bone.parent), None)
             if root_bone:
-                bones_to_remove = [bone for bone in armature.data.edit_bones if bone != root_bone]
-                for bone in bones_to_remove:
-                    armature.data.edit_bones.remove(bone)
+                with rigprofile.stage("bone removal"):
+                    bones_to_remove = [bone for bone in armature.data.edit_bones if bone != root_bone]
+                    for bone in bones_to_remove:
+                        armature.data.edit_bones.remove(bone)
+                armature.pop(RIG_RECORDS_KEY, None)
             if bpy.context.mode != 'OBJECT':
                 bpy.ops.object.mode_set(mode='OBJECT')
             self.report({'INFO'}, "All bones except the root have been cleared.")
@@ -479,7 +907,13 @@ def register():
     bpy.utils.register_class(OBJECT_OT_select_parent_bone)
     bpy.utils.register_class(OBJECT_OT_clear_selected_parent_bone)
     bpy.utils.register_class(OBJECT_OT_clear_all_bones_except_root)
+    bpy.utils.register_class(OBJECT_UL_bone_chains)
     bpy.utils.register_class(VIEW3D_PT_custom_panel)
+    add_handler(bpy.app.handlers.depsgraph_update_post, invalidate_analysis_cache)
+    add_handler(bpy.app.handlers.depsgraph_update_post, invalidate_bone_chain_cache)
+    add_handler(bpy.app.handlers.depsgraph_update_post, update_armature_registry)
+    add_handler(bpy.app.handlers.load_post, clear_session_caches)
+    rigprofile.register()
     bpy.types.Scene.selected_armature = bpy.props.PointerProperty(type=bpy.types.Object)
     bpy.types.Scene.selected_axes = bpy.props.EnumProperty(
         name="Axes",
@@ -519,7 +953,9 @@ def register():
         description="Choose the method for weight assignment",
         items=[
             ('ENVELOPE', "Envelope Weights", "Assign weights using envelope method"),
-            ('AUTO', "Automatic Weights", "Assign weights automatically")
+            ('AUTO', "Automatic Weights", "Assign weights automatically"),
+            ('RIGID', "Rigid (Bone Parent)", "Parent the object directly to its bone, no modifier or vertex group"),
+            ('DISTANCE', "Distance Weights", "Weight vertices by their distance to the closest bones, fast on dense meshes")
         ],
         default='AUTO'
     )
@@ -531,6 +967,11 @@ def register():
         max=100.0,
         subtype='PERCENTAGE'
     )
+    bpy.types.Scene.incremental_rig = bpy.props.BoolProperty(
+        name="Incremental Regenerate",
+        description="Generate Rig only adds, moves or removes the bones of objects that changed since the last run",
+        default=False
+    )
 
 def unregister():
     bpy.utils.unregister_class(OBJECT_OT_add_bone)
@@ -540,6 +981,12 @@ def unregister():
     bpy.utils.unregister_class(OBJECT_OT_clear_selected_parent_bone)
     bpy.utils.unregister_class(OBJECT_OT_clear_all_bones_except_root)
     bpy.utils.unregister_class(VIEW3D_PT_custom_panel)
+    bpy.utils.unregister_class(OBJECT_UL_bone_chains)
+    remove_handler(bpy.app.handlers.depsgraph_update_post, invalidate_analysis_cache)
+    remove_handler(bpy.app.handlers.depsgraph_update_post, invalidate_bone_chain_cache)
+    remove_handler(bpy.app.handlers.depsgraph_update_post, update_armature_registry)
+    remove_handler(bpy.app.handlers.load_post, clear_session_caches)
+    rigprofile.unregister()
     del bpy.types.Scene.selected_armature
     del bpy.types.Scene.selected_axes
     del bpy.types.Scene.go_to_pose_mode
@@ -548,6 +995,102 @@ def unregister():
     del bpy.types.Scene.check_for_wheels
     del bpy.types.Scene.weight_method
     del bpy.types.Scene.main_chain_cutoff
+    del bpy.types.Scene.incremental_rig
+
+class ConsoleReporter:
+    """Stands in for an operator when running without UI, reports go to stdout."""
+
+    def report(self, level, message):
+        print(f"{'/'.join(sorted(level))}: {message}")
+
+def run_cli(argv):
+    """
+    Generate a rig headless, with the same semantics as the Generate Rig button.
+
+    blender -b file.blend --python bonify.py -- --armature X --collection Y --weight-method RIGID
+    """
+    parser = argparse.ArgumentParser(prog="bonify.py", description="Generate a rig without the UI")
+    parser.add_argument("--armature", required=True, help="Name of the armature object")
+    parser.add_argument("--collection", help="Rig the meshes in this collection, default every mesh in the scene")
+    parser.add_argument("--weight-method", choices=['ENVELOPE', 'AUTO', 'RIGID', 'DISTANCE'])
+    parser.add_argument("--axes", help="Comma separated axes for closest bone parenting, e.g. Z,-X. Empty for the Y chain")
+    parser.add_argument("--parent-bone", help="Parent every new bone to this bone")
+    parser.add_argument("--main-chain-cutoff", type=float)
+    parser.add_argument("--full-length", action="store_true")
+    parser.add_argument("--no-wheels", action="store_true", help="Don't check for wheels")
+    parser.add_argument("--incremental", action="store_true", help="Only update the bones of objects that changed since the last run")
+    parser.add_argument("--save", action="store_true", help="Save the .blend in place")
+    parser.add_argument("--save-as", help="Save a copy of the .blend to this path")
+    parser.add_argument("--result-json", help="Write timings and stats to this file")
+    parser.add_argument("--profile", action="store_true", help="Add the stage breakdown to the result, same as BONIFY_PROFILE=1")
+    parser.add_argument("--cprofile", action="store_true", help="Also dump cProfile stats next to the .blend")
+    args = parser.parse_args(argv)
+
+    scene = bpy.context.scene
+    armature = bpy.data.objects.get(args.armature)
+    if armature is None or armature.type != 'ARMATURE':
+        print(f"ERROR: Armature '{args.armature}' not found")
+        sys.exit(1)
+    if args.collection:
+        collection = bpy.data.collections.get(args.collection)
+        if collection is None:
+            print(f"ERROR: Collection '{args.collection}' not found")
+            sys.exit(1)
+        objects = [obj for obj in collection.all_objects if obj.type == 'MESH']
+    else:
+        objects = [obj for obj in scene.objects if obj.type == 'MESH']
+
+    scene.selected_armature = armature
+    if args.weight_method:
+        scene.weight_method = args.weight_method
+    if args.axes is not None:
+        scene.selected_axes = {axis.strip() for axis in args.axes.split(",") if axis.strip()}
+    if args.parent_bone is not None:
+        scene.selected_parent_bone = args.parent_bone
+    if args.main_chain_cutoff is not None:
+        scene.main_chain_cutoff = args.main_chain_cutoff
+    scene.check_for_wheels = not args.no_wheels
+    scene.incremental_rig = args.incremental
+    # Through the environment rather than the scene, so a saved file keeps its own setting
+    if args.profile or args.cprofile:
+        os.environ["BONIFY_PROFILE"] = "1"
+    if args.cprofile:
+        os.environ["BONIFY_PROFILE_CPROFILE"] = "1"
+
+    start = time.perf_counter()
+    with rigprofile.run(bpy.context, "generate_rig") as profile:
+        bone_names, summary = generate_rig(ConsoleReporter(), bpy.context, armature, objects, args.full_length)
+    elapsed = time.perf_counter() - start
+
+    saved = None
+    if args.save_as:
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.save_as), copy=True)
+        saved = os.path.abspath(args.save_as)
+    elif args.save:
+        bpy.ops.wm.save_mainfile()
+        saved = bpy.data.filepath
+
+    result = {
+        "file": bpy.data.filepath,
+        "armature": armature.name,
+        "objects": len(objects),
+        "bones_created": len(bone_names),
+        "seconds": elapsed,
+        "mode_switches": mode_switch_count,
+        "max_depth": summary["max_depth"],
+        "orphans": len(summary["orphans"]),
+        "cyclic": len(summary["cyclic"]),
+        "saved": saved,
+    }
+    if profile is not None:
+        result["profile"] = profile.as_dict()
+    print(json.dumps(result))
+    if args.result_json:
+        with open(args.result_json, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
 
 if __name__ == "__main__":
-    register()
\ No newline at end of file
+    register()
+    if bpy.app.background and "--" in sys.argv:
+        run_cli(sys.argv[sys.argv.index("--") + 1:])
\ No newline at end of file
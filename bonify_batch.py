@@ -0,0 +1,131 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# Rig many .blend files with a pool of background Blender processes. Plain Python, no bpy:
+#   python bonify_batch.py assets/ --jobs 8 --output-dir rigged/ -- --armature Armature --weight-method RIGID
+# Everything after -- goes to bonify.py's command line, see run_cli there.
+
+BONIFY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bonify.py")
+
+def find_blend_files(paths, recursive=False):
+    """(file, path relative to its input directory) pairs, files given directly keep only their name."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "*.blend") if recursive else os.path.join(path, "*.blend")
+            files.extend((found, os.path.relpath(found, path)) for found in sorted(glob.glob(pattern, recursive=recursive)))
+        else:
+            files.append((path, os.path.basename(path)))
+    return files
+
+def build_command(args, blend_file, bonify_args, result_json, output=None):
+    command = [args.blender, "-b", blend_file, "--factory-startup", "--python-exit-code", "1",
+               "--python", BONIFY, "--"] + bonify_args + ["--result-json", result_json]
+    if output:
+        command += ["--save-as", output]
+    elif args.in_place:
+        command += ["--save"]
+    return command
+
+def rig_file(args, blend_file, bonify_args, env, output=None):
+    """Run one file, retrying failures. Returns a summary dict for the file."""
+    entry = {"file": blend_file, "attempts": 0, "ok": False}
+    start = time.perf_counter()
+    for attempt in range(args.retries + 1):
+        entry["attempts"] = attempt + 1
+        handle, result_json = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            attempt_start = time.perf_counter()
+            process = subprocess.run(build_command(args, blend_file, bonify_args, result_json, output),
+                                     capture_output=True, text=True, timeout=args.timeout, env=env)
+            entry["returncode"] = process.returncode
+            entry["attempt_seconds"] = time.perf_counter() - attempt_start
+            if process.returncode == 0 and os.path.getsize(result_json):
+                with open(result_json) as f:
+                    entry["result"] = json.load(f)
+                entry["ok"] = True
+                entry.pop("error", None)
+                break
+            entry["error"] = (process.stderr or process.stdout)[-2000:]
+        except subprocess.TimeoutExpired:
+            entry["returncode"] = None
+            entry["error"] = f"Timed out after {args.timeout} s"
+        finally:
+            os.remove(result_json)
+    entry["seconds"] = time.perf_counter() - start
+    return entry
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    bonify_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    own_args = argv[:argv.index("--")] if "--" in argv else argv
+
+    parser = argparse.ArgumentParser(description="Rig many .blend files with bonify.py in background Blender processes")
+    parser.add_argument("paths", nargs="+", help=".blend files or directories of them")
+    parser.add_argument("--recursive", action="store_true", help="Search directories recursively")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Blender processes running at once")
+    parser.add_argument("--retries", type=int, default=1, help="Extra attempts for a failing file")
+    parser.add_argument("--timeout", type=float, help="Seconds before a Blender process is killed")
+    save = parser.add_mutually_exclusive_group()
+    save.add_argument("--in-place", action="store_true", help="Save rigged files over the originals")
+    save.add_argument("--output-dir", help="Save rigged copies into this directory")
+    parser.add_argument("--summary", help="Write the JSON summary here instead of stdout")
+    args = parser.parse_args(own_args)
+
+    files = find_blend_files(args.paths, args.recursive)
+    outputs = {}
+    if args.output_dir:
+        # Keep the input layout under the output directory so same-named files don't overwrite each other
+        outputs = {blend_file: os.path.join(args.output_dir, relative) for blend_file, relative in files}
+        clashes = {}
+        for blend_file, output in outputs.items():
+            clashes.setdefault(os.path.normcase(os.path.abspath(output)), []).append(blend_file)
+        clashes = [sources for sources in clashes.values() if len(sources) > 1]
+        if clashes:
+            for sources in clashes:
+                print(f"Would save to the same output: {', '.join(sources)}", file=sys.stderr)
+            return 2
+        for output in outputs.values():
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    # Split the cores between Blender processes so distance weight pools don't oversubscribe
+    env = dict(os.environ)
+    env.setdefault("BONIFY_WEIGHT_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, args.jobs))))
+
+    start = time.perf_counter()
+    entries = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(rig_file, args, blend_file, bonify_args, env, outputs.get(blend_file))
+                   for blend_file, _ in files]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            status = "ok" if entry["ok"] else "FAILED"
+            print(f"{status:>6} {entry['seconds']:8.2f}s {entry['file']}", file=sys.stderr)
+
+    entries.sort(key=lambda entry: entry["file"])
+    summary = {
+        "files": len(entries),
+        "succeeded": sum(entry["ok"] for entry in entries),
+        "failed": sum(not entry["ok"] for entry in entries),
+        "jobs": args.jobs,
+        "wall_seconds": time.perf_counter() - start,
+        "file_seconds": sum(entry["seconds"] for entry in entries),
+        "entries": entries,
+    }
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+    return 0 if not summary["failed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import bpy
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+from mathutils import Vector
+# Benchmarks on synthetic scenes, run headless:
+#   blender -b --python bonify_bench.py -- --sizes 10 100 1000 10000 --output bench.json
+#   blender -b --python bonify_bench.py -- --benchmarks weights --weight-sizes 10000 100000
+#   blender -b --python bonify_bench.py -- --benchmarks train_playback --sizes 10 100 500
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bonify
+import newtape
+
+CUBE_VERTS = [(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)]
+CUBE_FACES = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+
+def cylinder_geometry(segments=16, radius=0.4, depth=0.2):
+    """Wheel-like cylinder along Y: equal X and Z extents, thinner along Y, so wheel detection matches it."""
+    angles = np.linspace(0, 2 * math.pi, segments, endpoint=False)
+    ring = np.stack((radius * np.cos(angles), np.zeros(segments), radius * np.sin(angles)), axis=1)
+    verts = np.concatenate((ring + (0, -depth / 2, 0), ring + (0, depth / 2, 0)))
+    sides = [(i, (i + 1) % segments, segments + (i + 1) % segments, segments + i) for i in range(segments)]
+    caps = [tuple(range(segments)), tuple(range(2 * segments - 1, segments - 1, -1))]
+    return verts.tolist(), sides + caps
+
+CYLINDER_VERTS, CYLINDER_FACES = cylinder_geometry()
+# Scene weight method for generate_rig and add_bone, None keeps the default
+WEIGHT_METHOD = None
+
+def reset_scene():
+    bpy.ops.wm.read_homefile(use_empty=True)
+
+def create_armature():
+    data = bpy.data.armatures.new("Bench_Armature")
+    armature = bpy.data.objects.new("Bench_Armature", data)
+    bpy.context.collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+    root = data.edit_bones.new("Root")
+    root.head = (0, 0, 0)
+    root.tail = (0, 1, 0)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature
+
+def create_parts(count, wheel_every=4):
+    """Cubes laid out on a grid, every wheel_every-th part a wheel-like cylinder."""
+    cube = bpy.data.meshes.new("Bench_Cube")
+    cube.from_pydata(CUBE_VERTS, [], CUBE_FACES)
+    wheel = bpy.data.meshes.new("Bench_Wheel")
+    wheel.from_pydata(CYLINDER_VERTS, [], CYLINDER_FACES)
+    columns = max(1, int(math.sqrt(count)))
+    parts = []
+    for i in range(count):
+        is_wheel = wheel_every and i % wheel_every == wheel_every - 1
+        # Own mesh copy per part, vertex groups live on the object but modifiers evaluate per mesh
+        obj = bpy.data.objects.new(f"{'Wheel' if is_wheel else 'Part'}_{i}", (wheel if is_wheel else cube).copy())
+        obj.location = (i % columns * 2, i // columns * 2, 0)
+        bpy.context.collection.objects.link(obj)
+        parts.append(obj)
+    return parts
+
+def create_chain_armature(bone_count, length):
+    data = bpy.data.armatures.new("Bench_Armature")
+    armature = bpy.data.objects.new("Bench_Armature", data)
+    bpy.context.collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+    step = length / bone_count
+    parent = None
+    for i in range(bone_count):
+        bone = data.edit_bones.new(f"Bone_{i}")
+        bone.head = (0, -length / 2 + i * step, 0)
+        bone.tail = (0, -length / 2 + (i + 1) * step, 0)
+        bone.parent = parent
+        parent = bone
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature
+
+def create_track_curve(length, points=64):
+    """NURBS track along Y with a gentle S bend."""
+    data = bpy.data.curves.new("Bench_Track", 'CURVE')
+    data.dimensions = '3D'
+    spline = data.splines.new('NURBS')
+    spline.points.add(points - 1)
+    ys = np.linspace(0, length, points)
+    coords = np.stack((np.sin(ys / length * 2 * math.pi) * length / 20, ys, np.zeros(points), np.ones(points)), axis=1)
+    spline.points.foreach_set("co", coords.ravel())
+    spline.use_endpoint_u = True
+    curve = bpy.data.objects.new("Bench_Track", data)
+    bpy.context.collection.objects.link(curve)
+    return curve
+
+def setup_generate_scene(count):
+    reset_scene()
+    armature = create_armature()
+    parts = create_parts(count)
+    for obj in parts:
+        obj.select_set(True)
+    bpy.context.scene.selected_armature = armature
+    if WEIGHT_METHOD:
+        bpy.context.scene.weight_method = WEIGHT_METHOD
+    bpy.context.view_layer.objects.active = parts[0]
+    return armature, parts
+
+def bench_generate_rig(count):
+    setup_generate_scene(count)
+    start = time.perf_counter()
+    bpy.ops.object.generate_rig()
+    return {"seconds": time.perf_counter() - start, "mode_switches": bonify.mode_switch_count}
+
+def bench_add_bone(count, calls=50):
+    """Add Bone on a scene of count parts. Reports the mean cost of one call."""
+    armature, parts = setup_generate_scene(count)
+    targets = parts[:calls]
+    start = time.perf_counter()
+    for obj in targets:
+        bpy.ops.object.select_all(action='DESELECT')
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+        bpy.ops.object.add_bone()
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed / len(targets), "calls": len(targets)}
+
+def bench_clear_bones(count):
+    setup_generate_scene(count)
+    bpy.ops.object.generate_rig()
+    start = time.perf_counter()
+    bpy.ops.object.clear_all_bones_except_root()
+    return {"seconds": time.perf_counter() - start}
+
+def bench_segmented_plane(count):
+    reset_scene()
+    locations = [Vector((0, i * 0.5, 0)) for i in range(count)]
+    start = time.perf_counter()
+    newtape.create_segmented_plane(locations, 1)
+    return {"seconds": time.perf_counter() - start}
+
+def setup_train_scene(count):
+    reset_scene()
+    length = count * 2.0
+    armature = create_chain_armature(count, length)
+    create_track_curve(length)
+    for bone in armature.data.bones:
+        bone.select = True
+    bpy.context.view_layer.objects.active = armature
+    armature.select_set(True)
+    return armature
+
+def bench_train_rig(count):
+    """add_train_path, setup_train_rig and setup_bone_constraints on a train of count cars."""
+    setup_train_scene(count)
+    timings = {}
+    for name, operator in (("add_train_path", bpy.ops.object.add_train_path),
+                           ("setup_train_rig", bpy.ops.object.setup_train_rig),
+                           ("setup_bone_constraints", bpy.ops.object.setup_bone_constraints)):
+        start = time.perf_counter()
+        operator()
+        timings[name] = time.perf_counter() - start
+        if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+    return {"seconds": sum(timings.values()), **timings}
+
+def bench_train_playback(count, frames=50):
+    """Mean scene.frame_set cost of a train of count cars, per-bone constraints against Spline IK."""
+    result = {}
+    for mode in ('CONSTRAINTS', 'SPLINE_IK'):
+        armature = setup_train_scene(count)
+        bpy.ops.object.add_train_path()
+        bpy.ops.object.setup_train_rig()
+        bpy.context.view_layer.objects.active = armature
+        if armature.mode != 'POSE':
+            bpy.ops.object.mode_set(mode='POSE')
+        bpy.context.scene.train_anim_properties.rig_mode = mode
+        bpy.ops.object.setup_bone_constraints()
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        armature["train_progress"] = 0.0
+        armature.keyframe_insert('["train_progress"]', frame=1)
+        armature["train_progress"] = 100.0
+        armature.keyframe_insert('["train_progress"]', frame=frames)
+        scene = bpy.context.scene
+        scene.frame_set(1)
+        start = time.perf_counter()
+        for frame in range(1, frames + 1):
+            scene.frame_set(frame)
+        result[mode.lower() + "_seconds"] = (time.perf_counter() - start) / frames
+    result["seconds"] = result["spline_ik_seconds"]
+    result["speedup"] = result["constraints_seconds"] / max(result["spline_ik_seconds"], 1e-9)
+    return result
+
+def bench_weights(vertex_count):
+    """ARMATURE_AUTO against DISTANCE weights on a grid of about vertex_count vertices."""
+    result = {}
+    for method in ('AUTO', 'DISTANCE'):
+        reset_scene()
+        armature = create_chain_armature(8, 10.0)
+        subdivisions = max(2, int(vertex_count ** 0.5))
+        bpy.ops.mesh.primitive_grid_add(x_subdivisions=subdivisions, y_subdivisions=subdivisions, size=10.0)
+        grid = bpy.context.active_object
+
+        start = time.perf_counter()
+        if method == 'AUTO':
+            bpy.ops.object.select_all(action='DESELECT')
+            grid.select_set(True)
+            armature.select_set(True)
+            bpy.context.view_layer.objects.active = armature
+            bpy.ops.object.parent_set(type='ARMATURE_AUTO')
+        else:
+            bonify.ensure_armature_modifier(grid, armature)
+            bonify.assign_distance_weights(grid, armature)
+        result[method.lower() + "_seconds"] = time.perf_counter() - start
+        result["vertices"] = len(grid.data.vertices)
+    result["seconds"] = result["distance_seconds"]
+    return result
+
+BENCHMARKS = {
+    "generate_rig": bench_generate_rig,
+    "add_bone": bench_add_bone,
+    "clear_bones": bench_clear_bones,
+    "segmented_plane": bench_segmented_plane,
+    "train_rig": bench_train_rig,
+    "train_playback": bench_train_playback,
+    "weights": bench_weights,
+}
+
+def scaling_exponent(points):
+    """Slope of log(seconds) over log(size): about 1 for linear, 2 for quadratic."""
+    points = [point for point in points if point["seconds"] > 0]
+    if len(points) < 2:
+        return None
+    sizes = np.log([point["size"] for point in points])
+    seconds = np.log([point["seconds"] for point in points])
+    return float(np.polyfit(sizes, seconds, 1)[0])
+
+def main():
+    global WEIGHT_METHOD
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="bonify_bench.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Part, car or station counts")
+    parser.add_argument("--weight-sizes", type=int, nargs="+", default=[10000, 100000], help="Vertex counts for weights")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS),
+                        default=[name for name in BENCHMARKS if name not in ("weights", "train_playback")])
+    parser.add_argument("--weight-method", help="Scene weight method for generate_rig and add_bone")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    WEIGHT_METHOD = args.weight_method
+    bonify.register()
+    newtape.register()
+    results = {
+        "blender": bpy.app.version_string,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "benchmarks": {},
+    }
+    for name in args.benchmarks:
+        sizes = args.weight_sizes if name == "weights" else args.sizes
+        points = []
+        for size in sizes:
+            point = {"size": size, **BENCHMARKS[name](size)}
+            points.append(point)
+            extra = " ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                             for key, value in point.items() if key not in ("size", "seconds"))
+            print(f"{name:>16} {size:>8} {point['seconds']:>10.4f}s {extra}")
+        exponent = scaling_exponent(points)
+        results["benchmarks"][name] = {"points": points, "scaling_exponent": exponent}
+        if exponent is not None:
+            print(f"{name:>16} scaling exponent {exponent:.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import bpy
+import numpy as np
+# Arc length sampling of curve objects for the train tools. Every spline of
+# the evaluated curve becomes an ArcLengthTable (cumulative length over its
+# evaluated points), cached per curve datablock and rebuilt only when the
+# control points, resolution or transform change. Lookups by distance are a
+# binary search, so positions don't bunch up where NURBS parameter speed varies.
+
+class ArcLengthTable:
+    """Cumulative length along a world space polyline, answering position and tangent at a distance."""
+
+    def __init__(self, points, cyclic=False):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if cyclic and len(points) > 1:
+            points = np.concatenate((points, points[:1]))
+        self.points = points
+        self.cyclic = cyclic
+        self.cumulative = np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))))
+        self.length = float(self.cumulative[-1])
+
+    def at(self, distances):
+        """
+        Positions and unit tangents at arc lengths, for an array of distances of any shape.
+
+        Distances wrap around cyclic splines and are clamped to the ends of open ones.
+
+        :return: (positions, tangents), each of shape distances.shape + (3,)
+        """
+        shape = np.shape(distances)
+        flat = np.ravel(distances).astype(np.float64)
+        if self.cyclic and self.length > 0:
+            flat = np.mod(flat, self.length)
+        else:
+            flat = np.clip(flat, 0.0, self.length)
+        segments = np.clip(np.searchsorted(self.cumulative, flat, side='right') - 1, 0, len(self.points) - 2)
+        vectors = self.points[segments + 1] - self.points[segments]
+        lengths = np.maximum(self.cumulative[segments + 1] - self.cumulative[segments], 1e-12)
+        t = (flat - self.cumulative[segments]) / lengths
+        positions = self.points[segments] + vectors * t[:, None]
+        tangents = vectors / lengths[:, None]
+        return positions.reshape(shape + (3,)), tangents.reshape(shape + (3,))
+
+# Curve data name -> (control point hash, [ArcLengthTable per spline])
+table_cache = {}
+
+def control_point_hash(curve):
+    """Hash of everything the evaluated polyline depends on, without evaluating it."""
+    data = curve.data
+    parts = [np.array(curve.matrix_world, dtype=np.float64).tobytes(),
+             repr((data.resolution_u, data.dimensions, data.twist_mode)).encode()]
+    for spline in data.splines:
+        parts.append(repr((spline.type, spline.order_u, spline.resolution_u, spline.use_cyclic_u,
+                           spline.use_endpoint_u, spline.use_bezier_u)).encode())
+        if spline.type == 'BEZIER':
+            for attribute in ("co", "handle_left", "handle_right"):
+                values = np.empty(len(spline.bezier_points) * 3, dtype=np.float64)
+                spline.bezier_points.foreach_get(attribute, values)
+                parts.append(values.tobytes())
+        else:
+            values = np.empty(len(spline.points) * 4, dtype=np.float64)
+            spline.points.foreach_get("co", values)
+            parts.append(values.tobytes())
+    return hash(b"".join(parts))
+
+def polyline_mesh_coords(curve, depsgraph):
+    """Vertex coordinates and edges of the curve evaluated as bare polylines, in object space."""
+    data = curve.data
+    has_geometry = data.bevel_depth or data.extrude or data.bevel_object is not None
+    if has_geometry:
+        # Bevel and extrusion turn the polyline into a surface, evaluate a flat copy instead
+        source = curve.copy()
+        source.data = data.copy()
+        source.data.bevel_depth = 0.0
+        source.data.extrude = 0.0
+        source.data.bevel_object = None
+    else:
+        source = curve.evaluated_get(depsgraph)
+    mesh = source.to_mesh()
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", coords)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int64)
+    mesh.edges.foreach_get("vertices", edges)
+    source.to_mesh_clear()
+    if has_geometry:
+        copied = source.data
+        bpy.data.objects.remove(source, do_unlink=True)
+        bpy.data.curves.remove(copied)
+    return coords.reshape(-1, 3), edges.reshape(-1, 2)
+
+def split_splines(count, edges):
+    """
+    Split evaluated curve vertices into splines.
+
+    Each spline's vertices are consecutive and joined by (i, i + 1) edges. A
+    cyclic spline also has an edge from its last vertex back to its first.
+
+    :return: List of (start, end, cyclic) vertex ranges
+    """
+    linked = np.zeros(max(count - 1, 0), dtype=bool)
+    lo, hi = edges.min(axis=1), edges.max(axis=1)
+    step = hi - lo == 1
+    linked[lo[step]] = True
+    breaks = np.flatnonzero(~linked) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [count]))
+    closing = set(zip(lo[~step].tolist(), hi[~step].tolist()))
+    return [(int(start), int(end), (int(start), int(end) - 1) in closing) for start, end in zip(starts, ends)]
+
+def curve_tables(curve, depsgraph):
+    """ArcLengthTable per spline of a curve object in world space, from the cache when nothing changed."""
+    key = curve.data.name_full
+    fingerprint = control_point_hash(curve)
+    cached = table_cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    coords, edges = polyline_mesh_coords(curve, depsgraph)
+    matrix = np.array(curve.matrix_world, dtype=np.float64)
+    points = coords @ matrix[:3, :3].T + matrix[:3, 3]
+    tables = [ArcLengthTable(points[start:end], cyclic)
+              for start, end, cyclic in split_splines(len(points), edges) if end - start > 1]
+    table_cache[key] = (fingerprint, tables)
+    return tables
+
+def clear_cache():
+    table_cache.clear()
@@ -1,54 +1,67 @@
 import bpy
-import bmesh
+import numpy as np
 import math
+import os
+import sys
 from mathutils import Vector, Matrix, Quaternion
+
+# Sibling modules live next to this file; inside Blender's text editor they
+# are imported from text blocks of the same name instead.
+_here = os.path.dirname(os.path.abspath(globals().get("__file__", "")))
+if os.path.isdir(_here) and _here not in sys.path:
+    sys.path.append(_here)
+
+import rigprofile
+import curvesample
 # +z up +y fwd aligned train with bones and nurbs curve. 
-def create_segmented_plane(bone_locations, width):
-    mesh = bpy.data.meshes.new("Train_Path")
-    plane = bpy.data.objects.new("Train_Path", mesh)
+def create_segmented_plane(bone_locations, width, name="Train_Path"):
+    mesh = bpy.data.meshes.new(name)
+    plane = bpy.data.objects.new(name, mesh)
     bpy.context.collection.objects.link(plane)
     
-    bm = bmesh.new()
+    # Two vertices per bone, +X then -X, and a quad between neighbouring pairs, built as arrays in one pass
+    locations = np.array(bone_locations, dtype=np.float64).reshape(-1, 3)
+    count = len(locations)
     half_width = width / 2
+    verts = np.repeat(locations, 2, axis=0)
+    verts[0::2, 0] += half_width
+    verts[1::2, 0] -= half_width
+    starts = np.arange(count - 1) * 2
+    quads = np.stack((starts, starts + 1, starts + 3, starts + 2), axis=1)
+    # Faces bring their edges, a single pair needs its edge spelled out
+    edges = [(0, 1)] if count == 1 else []
+    mesh.from_pydata(verts.tolist(), edges, quads.tolist())
     
-    for i, location in enumerate(bone_locations):
-        v1 = bm.verts.new(location + Vector((half_width, 0, 0)))
-        v2 = bm.verts.new(location + Vector((-half_width, 0, 0)))
-        bm.verts.ensure_lookup_table()
-        
-        bm.edges.new((v1, v2))
-        
-        if i > 0:
-            bm.faces.new((bm.verts[-4], bm.verts[-3], bm.verts[-1], bm.verts[-2]))
-    
-    bm.to_mesh(mesh)
-    bm.free()
-    
-    for i in range(len(bone_locations)):
+    for i, pair in enumerate(np.arange(count * 2).reshape(-1, 2).tolist()):
         vg = plane.vertex_groups.new(name=f"Bone_{i+1}")
-        vg.add([i*2, i*2+1], 1.0, 'REPLACE')
+        vg.add(pair, 1.0, 'REPLACE')
     
     return plane
 
+def transform_spline_points(curve_data, matrix):
+    """Apply a 4x4 matrix to every NURBS/poly point and Bezier point and handle, in bulk."""
+    linear = matrix[:3, :3].T
+    offset = matrix[:3, 3]
+    for spline in curve_data.splines:
+        if spline.type == 'BEZIER':
+            points = spline.bezier_points
+            coords = np.empty(len(points) * 3, dtype=np.float64)
+            for attribute in ("co", "handle_left", "handle_right"):
+                points.foreach_get(attribute, coords)
+                points.foreach_set(attribute, (coords.reshape(-1, 3) @ linear + offset).ravel())
+        else:
+            points = spline.points
+            coords = np.empty((len(points), 4), dtype=np.float64)
+            points.foreach_get("co", coords.ravel())
+            # The fourth component is the NURBS weight, not a homogeneous coordinate
+            coords[:, :3] = coords[:, :3] @ linear + offset
+            points.foreach_set("co", coords.ravel())
+
 def bake_curve(curve):
-    # Store the original world matrix
-    original_matrix = curve.matrix_world.copy()
-
-    # Create a temporary copy of the curve
-    temp_curve = curve.copy()
-    temp_curve.data = temp_curve.data.copy()
-    bpy.context.collection.objects.link(temp_curve)
-
-    # Apply all transformations to the temporary curve
-    temp_curve.data.transform(temp_curve.matrix_world)
-    temp_curve.matrix_world = Matrix.Identity(4)
-
-    # Calculate the tangent direction at the start of the curve
-    spline = temp_curve.data.splines[0]
-    if len(spline.points) >= 2:
-        start_point = spline.points[0].co.xyz
-        next_point = spline.points[1].co.xyz
-        direction = (next_point - start_point).normalized()
+    # Tangent at the start of the evaluated curve, NURBS control points don't lie on it
+    tables = curvesample.curve_tables(curve, bpy.context.evaluated_depsgraph_get())
+    if tables and tables[0].length > 0:
+        direction = Vector(tables[0].at(0.0)[1])
     else:
         # Fallback if the curve has only one point
         direction = Vector((0, 1, 0))
@@ -60,23 +73,23 @@ def bake_curve(curve):
     z_axis = x_axis.cross(y_axis)
     rotation_matrix = Matrix((x_axis, y_axis, z_axis)).to_4x4()
 
-    # Apply the rotation to all points in the curve
-    for spline in temp_curve.data.splines:
-        for point in spline.points:
-            point.co = rotation_matrix @ point.co
+    # World transform and alignment in one pass over the original data
+    matrix = np.array(rotation_matrix @ curve.matrix_world, dtype=np.float64)
+    transform_spline_points(curve.data, matrix)
+    curve.data.update_tag()
 
-    # Transfer the baked data back to the original curve
-    curve.data = temp_curve.data
+    # The world transform now lives in the points
+    curve.matrix_world = Matrix.Identity(4)
 
-    # Restore the original world matrix
-    curve.matrix_world = original_matrix
-
-    # Remove the temporary curve
-    bpy.data.objects.remove(temp_curve, do_unlink=True)
-
-def setup_train_rig(armature, plane, curve):
+def setup_train_rig(armature, plane, curve, start_offset=0.0, bake=True):
+    """
+    :param start_offset: Distance along the curve the train starts at
+    :param bake: Bake the curve first, off when another train already baked it
+    """
     # Bake the curve to ensure correct orientation
-    bake_curve(curve)
+    if bake:
+        with rigprofile.stage("bake curve"):
+            bake_curve(curve)
     
     # Ensure the curve has a path
     curve.data.use_path = True
@@ -84,18 +97,22 @@ def setup_train_rig(armature, plane, curve):
     curve.data.use_stretch = False
     curve.data.use_deform_bounds = True
 
-    bpy.ops.object.mode_set(mode='EDIT')
-    
-    # Create control bone
-    control_bone = armature.data.edit_bones.new("Train_Control")
-    control_bone.head = (0, 0, 0)
-    control_bone.tail = (0, 1, 0)  # Point along Y-axis
-    
-    bpy.ops.object.mode_set(mode='POSE')
+    with rigprofile.stage("bone creation"):
+        bpy.ops.object.mode_set(mode='EDIT')
+        
+        # Create control bone
+        edit_bones = armature.data.edit_bones
+        control_bone = edit_bones.get("Train_Control") or edit_bones.new("Train_Control")
+        control_bone.head = (0, 0, 0)
+        control_bone.tail = (0, 1, 0)  # Point along Y-axis
+        
+        bpy.ops.object.mode_set(mode='POSE')
     
     # Add follow path constraint to control bone
     control_bone_pose = armature.pose.bones["Train_Control"]
-    follow_path = control_bone_pose.constraints.new(type='FOLLOW_PATH')
+    follow_path = next((c for c in control_bone_pose.constraints if c.type == 'FOLLOW_PATH'), None)
+    if follow_path is None:
+        follow_path = control_bone_pose.constraints.new(type='FOLLOW_PATH')
     follow_path.target = curve
     follow_path.use_curve_follow = True
     follow_path.forward_axis = 'FORWARD_Y'
@@ -112,32 +129,32 @@ def setup_train_rig(armature, plane, curve):
     plane.rotation_euler = (math.radians(90), 0, math.radians(90))  # Adjust rotation
     
     # Add curve modifier to plane
-    curve_mod = plane.modifiers.new(name="Curve", type='CURVE')
+    curve_mod = next((mod for mod in plane.modifiers if mod.type == 'CURVE'), None)
+    if curve_mod is None:
+        curve_mod = plane.modifiers.new(name="Curve", type='CURVE')
     curve_mod.object = curve
     curve_mod.deform_axis = 'POS_Y'
     
-    # Add custom property to control the offset
-    armature["train_progress"] = 0.0
-    armature.id_properties_ui("train_progress").update(min=0.0, max=100.0, soft_min=0.0, soft_max=100.0)
+    # Add custom properties to control the offset
+    ensure_train_progress(armature)
+    armature["train_start_offset"] = start_offset
     
-    # Add driver to control the offset
-    fcurve = follow_path.driver_add("offset")
-    driver = fcurve.driver
-    var = driver.variables.new()
-    var.name = "progress"
-    var.type = 'SINGLE_PROP'
-    var.targets[0].id = armature
-    var.targets[0].data_path = '["train_progress"]'
-    driver.expression = "progress / 100.0"
+    # Drive the offset factor, with a fixed location the frame offset does nothing
+    follow_path.driver_remove("offset")
+    wire_progress(armature, bpy.context.evaluated_depsgraph_get(), keyed=armature.get("train_progress_keyed", False))
     
     return control_bone_pose
 
 def setup_bone_constraints(armature, plane, loc_axis, loc_inverse, influence):
-    sorted_bones = sorted(
-        (bone for bone in armature.pose.bones if bone.bone.select),
-        key=lambda b: (armature.matrix_world @ b.head).y
-    )
-    
+    with rigprofile.stage("sorting"):
+        sorted_bones = sorted(
+            (bone for bone in armature.pose.bones if bone.bone.select),
+            key=lambda b: (armature.matrix_world @ b.head).y
+        )
+    with rigprofile.stage("constraints"):
+        add_bone_constraints(armature, plane, sorted_bones, loc_axis, loc_inverse, influence)
+
+def add_bone_constraints(armature, plane, sorted_bones, loc_axis, loc_inverse, influence):
     for i, bone in enumerate(sorted_bones):
         for constraint in bone.constraints:
             bone.constraints.remove(constraint)
@@ -171,12 +188,557 @@ def setup_bone_constraints(armature, plane, loc_axis, loc_inverse, influence):
             track_constraint.track_axis = 'TRACK_Y'
             track_constraint.influence = influence
 
+# A Spline IK constraint drives at most this many bones
+SPLINE_IK_MAX_CHAIN = 255
+
+def find_track_curve():
+    """The track: the first curve object that isn't one of our Spline IK guides."""
+    return next((obj for obj in bpy.data.objects if obj.type == 'CURVE' and not obj.get("train_guide")), None)
+
+def train_curve(armature):
+    """The armature's own track, its Train_Control follow path target, else the first track curve."""
+    control = armature.pose.bones.get("Train_Control")
+    if control is not None:
+        for constraint in control.constraints:
+            if constraint.type == 'FOLLOW_PATH' and constraint.target is not None:
+                return constraint.target
+    return find_track_curve()
+
+def train_plane(armature):
+    """The armature's Train_Path_<armature> plane from Rig Fleet, else the single Train_Path."""
+    return bpy.data.objects.get(f"Train_Path_{armature.name}") or bpy.data.objects.get("Train_Path")
+
+def ensure_train_progress(armature):
+    if "train_progress" not in armature:
+        armature["train_progress"] = 0.0
+        armature.id_properties_ui("train_progress").update(min=0.0, max=100.0, soft_min=0.0, soft_max=100.0)
+    if "train_start_offset" not in armature:
+        armature["train_start_offset"] = 0.0
+
+def add_progress_driver(owner, data_path, armature, expression, index=-1):
+    """Driver reading the armature's train_progress as progress and train_start_offset as start."""
+    driver = owner.driver_add(data_path, index).driver
+    for name, prop in (("progress", "train_progress"), ("start", "train_start_offset")):
+        if name not in expression:
+            continue
+        var = driver.variables.new()
+        var.name = name
+        var.type = 'SINGLE_PROP'
+        var.targets[0].id = armature
+        var.targets[0].data_path = f'["{prop}"]'
+    driver.expression = expression
+    return driver
+
+def progress_targets(armature, depsgraph):
+    """
+    Everything train_progress moves on a train rig, as (owner, data path, index, progress scale, start scale).
+
+    Each value is progress * progress scale + train_start_offset * start scale:
+    the control bone's follow path offset factor, and the location along the
+    track of the train's Spline IK guides.
+    """
+    targets = []
+    control = armature.pose.bones.get("Train_Control")
+    follow_path = next((c for c in control.constraints if c.type == 'FOLLOW_PATH' and c.target), None) if control else None
+    if follow_path is not None:
+        tables = curvesample.curve_tables(follow_path.target, depsgraph)
+        length = tables[0].length if tables else 0.0
+        targets.append((follow_path, "offset_factor", -1, 0.01, 1.0 / length if length else 0.0))
+    for guide in bpy.data.objects:
+        if guide.get("train_guide") and guide.get("train_armature") == armature.name:
+            targets.append((guide, "location", 1, guide["train_length"] / 100.0, 1.0))
+    return targets
+
+def wire_progress(armature, depsgraph, keyed=False, frames=None):
+    """
+    Connect train_progress to the rig with drivers, or key its result without any driver.
+
+    Keyed mode evaluates train_progress (its fcurve when animated) at every
+    frame and writes the offsets as dense fcurves, so playback and render
+    farms never run a driver. Drivers are removed in keyed mode and the keys
+    in driver mode.
+
+    :param frames: Frames to key, the scene frame range by default
+    :return: Number of properties wired
+    """
+    if frames is None:
+        scene = bpy.context.scene
+        frames = range(scene.frame_start, scene.frame_end + 1)
+    frames = np.asarray(frames, dtype=np.float64)
+    targets = progress_targets(armature, depsgraph)
+    progress = progress_per_frame(armature, frames) if keyed else None
+    start = float(armature.get("train_start_offset", 0.0))
+    for owner, prop, index, progress_scale, start_scale in targets:
+        owner.driver_remove(prop, index)
+        id_data = owner.id_data
+        path = owner.path_from_id(prop)
+        action = id_data.animation_data.action if id_data.animation_data else None
+        if action is not None:
+            for fcurve in [fcurve for fcurve in action.fcurves
+                           if fcurve.data_path == path and index in (-1, fcurve.array_index)]:
+                action.fcurves.remove(fcurve)
+        if keyed:
+            values = progress * progress_scale + start * start_scale
+            animation_data = id_data.animation_data or id_data.animation_data_create()
+            if animation_data.action is None:
+                animation_data.action = bpy.data.actions.new(f"{id_data.name}_TrainProgress")
+            write_baked_fcurves(animation_data.action, path, frames, values[:, None], "Train Progress",
+                                first_index=max(index, 0))
+        else:
+            # Multiply-add on two variables stays on Blender's simple expression path, no Python needed
+            expression = f"progress * {progress_scale:.9g}"
+            if start_scale:
+                expression += f" + start * {start_scale:.9g}"
+            add_progress_driver(owner, prop, armature, expression, index)
+    armature["train_progress_keyed"] = keyed
+    return len(targets)
+
+def speed_profile_distances(times, length, max_speed, acceleration, deceleration, stops=()):
+    """
+    Distance travelled at each time by a train accelerating, cruising and braking between stops.
+
+    Every leg between stops is a trapezoidal speed profile (triangular when the
+    leg is too short to reach max_speed), and the train waits out each stop's
+    dwell before leaving. Under constant acceleration per phase the integral
+    of speed is exact, so every time is looked up in the phase table at once.
+
+    :param times: Seconds from the start, any shape
+    :param length: Distance to the final stop
+    :param stops: (distance, dwell seconds) stations along the way, a distance of 0 waits before starting
+    :return: (distances shaped like times, total seconds of the run)
+    """
+    dwells = {}
+    for distance, dwell in stops:
+        distance = min(max(float(distance), 0.0), length)
+        dwells[distance] = dwells.get(distance, 0.0) + max(float(dwell), 0.0)
+    waypoints = sorted(set(dwells) | {0.0, length})
+
+    # Phase table: start time, start distance, start speed, acceleration, duration
+    phases = []
+    clock = 0.0
+    def add(position, speed, accel, duration):
+        nonlocal clock
+        if duration > 0:
+            phases.append((clock, position, speed, accel, duration))
+            clock += duration
+    add(0.0, 0.0, 0.0, dwells.get(0.0, 0.0))
+    for start, end in zip(waypoints, waypoints[1:]):
+        leg = end - start
+        peak = min(max_speed, math.sqrt(2 * leg * acceleration * deceleration / (acceleration + deceleration)))
+        if peak <= 0:
+            continue
+        accel_distance = peak * peak / (2 * acceleration)
+        decel_distance = peak * peak / (2 * deceleration)
+        add(start, 0.0, acceleration, peak / acceleration)
+        add(start + accel_distance, peak, 0.0, max(leg - accel_distance - decel_distance, 0.0) / peak)
+        add(end - decel_distance, peak, -deceleration, peak / deceleration)
+        if end < length:
+            add(end, 0.0, 0.0, dwells.get(end, 0.0))
+    if not phases:
+        return np.zeros(np.shape(times)), 0.0
+
+    table = np.array(phases, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    index = np.clip(np.searchsorted(table[:, 0], times, side='right') - 1, 0, len(table) - 1)
+    start_time, position, speed, accel, duration = np.moveaxis(table[index], -1, 0)
+    elapsed = np.clip(times - start_time, 0.0, duration)
+    return position + speed * elapsed + 0.5 * accel * elapsed * elapsed, clock
+
+def key_speed_profile(armature, length, travel, max_speed, acceleration, deceleration, stops, frame_start, fps):
+    """
+    Key train_progress on every frame of a speed profile run, written with one foreach_set.
+
+    :param length: Distance train_progress 100 stands for, the whole curve like the drivers use
+    :param travel: Distance the run covers, to the final stop
+    :return: Frames keyed
+    """
+    _, seconds = speed_profile_distances(0.0, travel, max_speed, acceleration, deceleration, stops)
+    frames = np.arange(frame_start, frame_start + math.ceil(seconds * fps) + 1, dtype=np.float64)
+    distances, _ = speed_profile_distances((frames - frame_start) / fps, travel, max_speed,
+                                           acceleration, deceleration, stops)
+    ensure_train_progress(armature)
+    animation_data = armature.animation_data or armature.animation_data_create()
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(f"{armature.name}_TrainProgress")
+    progress = distances / length * 100.0 if length > 0 else np.zeros_like(distances)
+    write_baked_fcurves(animation_data.action, '["train_progress"]', frames, progress[:, None], "Train Progress")
+    return frames
+
+def progress_drivers(objects=None):
+    """
+    Drivers reading train_progress or train_start_offset that Blender can't evaluate without Python.
+
+    :return: List of (object name, driven data path, reason)
+    """
+    slow = []
+    for obj in bpy.data.objects if objects is None else objects:
+        if obj.animation_data is None:
+            continue
+        for fcurve in obj.animation_data.drivers:
+            driver = fcurve.driver
+            reads_progress = any(target.data_path in ('["train_progress"]', '["train_start_offset"]')
+                                 for var in driver.variables for target in var.targets)
+            if not reads_progress:
+                continue
+            path = f"{fcurve.data_path}[{fcurve.array_index}]"
+            if not driver.is_valid:
+                slow.append((obj.name, path, "invalid"))
+            elif driver.type == 'SCRIPTED' and not driver.is_simple_expression:
+                slow.append((obj.name, path, f"needs Python: {driver.expression}"))
+    return slow
+
+def train_cars(armature, selected_only=True):
+    """Car pose bones in train order along the armature's Y, without the control and spacer bones."""
+    return sorted(
+        (bone for bone in armature.pose.bones
+         if (bone.bone.select or not selected_only)
+         and bone.name != "Train_Control" and not bone.name.startswith("Train_Gap_")),
+        key=lambda b: (armature.matrix_world @ b.head).y
+    )
+
+def build_guide_curve(name, armature, curve, start, end, points, length):
+    """
+    Straight curve from start to end along Y, bent onto the track by a Curve modifier.
+
+    It is parented to the track so its Y is distance along the track, and a
+    driver slides it by train_progress percent of the track's length plus the
+    train's start offset.
+    """
+    guide = bpy.data.objects.get(name)
+    if guide is None:
+        data = bpy.data.curves.new(name, 'CURVE')
+        guide = bpy.data.objects.new(name, data)
+        bpy.context.collection.objects.link(guide)
+    data = guide.data
+    data.dimensions = '3D'
+    data.use_path = True
+    data.splines.clear()
+    spline = data.splines.new('POLY')
+    spline.points.add(points - 1)
+    coords = np.zeros((points, 4))
+    coords[:, 1] = np.linspace(start, end, points)
+    coords[:, 3] = 1.0
+    spline.points.foreach_set("co", coords.ravel())
+    guide["train_guide"] = True
+
+    guide.parent = curve
+    guide.matrix_parent_inverse = Matrix.Identity(4)
+    guide.location = (0, 0, 0)
+    guide.rotation_euler = (0, 0, 0)
+    if not any(mod.type == 'CURVE' for mod in guide.modifiers):
+        curve_mod = guide.modifiers.new(name="Curve", type='CURVE')
+        curve_mod.deform_axis = 'POS_Y'
+    next(mod for mod in guide.modifiers if mod.type == 'CURVE').object = curve
+
+    guide["train_armature"] = armature.name
+    guide["train_length"] = length
+    return guide
+
+def setup_spline_ik(armature, curve, cars, depsgraph):
+    """
+    Drive the cars with Spline IK instead of three constraints per bone.
+
+    The cars are parented into one chain in train order, with a non-deforming
+    spacer bone wherever there is a gap between two cars, because Spline IK
+    lays bones out end to end. Each stretch of up to SPLINE_IK_MAX_CHAIN bones
+    gets one Spline IK constraint following its own guide curve.
+
+    :param cars: Pose bones of the cars, in train order
+    :return: Number of Spline IK constraints
+    """
+    names = [bone.name for bone in cars]
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+    edit_bones = armature.data.edit_bones
+    chain = [names[0]]
+    for i, (previous, name) in enumerate(zip(names, names[1:])):
+        parent = edit_bones[previous]
+        bone = edit_bones[name]
+        if bone.head.y - parent.tail.y > 1e-4:
+            gap = edit_bones.get(f"Train_Gap_{i + 1}") or edit_bones.new(f"Train_Gap_{i + 1}")
+            gap.head = parent.tail
+            gap.tail = bone.head
+            gap.use_deform = False
+            gap.parent = parent
+            gap.use_connect = False
+            chain.append(gap.name)
+            parent = gap
+        bone.parent = parent
+        bone.use_connect = False
+        chain.append(name)
+    heads = {name: edit_bones[name].head.y for name in chain}
+    tails = {name: edit_bones[name].tail.y for name in chain}
+    bpy.ops.object.mode_set(mode='POSE')
+
+    tables = curvesample.curve_tables(curve, depsgraph)
+    scale = sum(curve.matrix_world.to_scale()) / 3
+    length = tables[0].length / scale if tables else 0.0
+    ensure_train_progress(armature)
+
+    # Chunks end on a car, the constraint must sit on a bone that baking mutes
+    chunks = []
+    start = 0
+    while start < len(chain):
+        end = min(start + SPLINE_IK_MAX_CHAIN, len(chain))
+        if chain[end - 1].startswith("Train_Gap_"):
+            end -= 1
+        chunks.append(chain[start:end])
+        start = end
+    for k, chunk in enumerate(chunks):
+        for name in chunk:
+            pose_bone = armature.pose.bones[name]
+            for constraint in list(pose_bone.constraints):
+                pose_bone.constraints.remove(constraint)
+        # Four guide points per bone keep the bent guide close to the track
+        guide = build_guide_curve(f"Train_Guide_{armature.name}_{k + 1}", armature, curve, heads[chunk[0]], tails[chunk[-1]],
+                                  len(chunk) * 4 + 1, length)
+        spline_ik = armature.pose.bones[chunk[-1]].constraints.new('SPLINE_IK')
+        spline_ik.target = guide
+        spline_ik.chain_count = len(chunk)
+        spline_ik.use_curve_radius = False
+        spline_ik.y_scale_mode = 'NONE'
+        spline_ik.xz_scale_mode = 'NONE'
+    wire_progress(armature, depsgraph, keyed=armature.get("train_progress_keyed", False))
+    return len(chunks)
+
+# Armature custom property: baked bone name -> rotation mode before baking
+TRAIN_BAKED_KEY = "train_baked"
+
+def orthonormal_frames(forward, up=(0.0, 0.0, 1.0)):
+    """Rotation matrices with Y along forward and Z as close to up as possible, columns X, Y, Z."""
+    y_axis = forward / np.maximum(np.linalg.norm(forward, axis=-1, keepdims=True), 1e-12)
+    x_axis = np.cross(y_axis, np.broadcast_to(up, y_axis.shape))
+    x_axis /= np.maximum(np.linalg.norm(x_axis, axis=-1, keepdims=True), 1e-12)
+    z_axis = np.cross(x_axis, y_axis)
+    return np.stack((x_axis, y_axis, z_axis), axis=-1)
+
+def matrices_to_quaternions(rotations):
+    """(..., 3, 3) rotation matrices to (..., 4) w, x, y, z quaternions."""
+    m = rotations
+    trace = m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]
+    # Largest of w, x, y, z squared, times four, picks a numerically safe formula per matrix
+    candidates = np.stack((1 + trace,
+                           1 + m[..., 0, 0] - m[..., 1, 1] - m[..., 2, 2],
+                           1 - m[..., 0, 0] + m[..., 1, 1] - m[..., 2, 2],
+                           1 - m[..., 0, 0] - m[..., 1, 1] + m[..., 2, 2]), axis=-1)
+    largest = candidates.argmax(axis=-1)
+    root = np.sqrt(np.maximum(np.take_along_axis(candidates, largest[..., None], axis=-1)[..., 0], 1e-12))
+    half = 0.5 / root
+    wx, wy, wz = m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1]
+    xy, xz, yz = m[..., 1, 0] + m[..., 0, 1], m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] + m[..., 1, 2]
+    options = np.stack((
+        np.stack((root / 2, wx * half, wy * half, wz * half), axis=-1),
+        np.stack((wx * half, root / 2, xy * half, xz * half), axis=-1),
+        np.stack((wy * half, xy * half, root / 2, yz * half), axis=-1),
+        np.stack((wz * half, xz * half, yz * half, root / 2), axis=-1),
+    ), axis=-2)
+    return np.take_along_axis(options, largest[..., None, None], axis=-2)[..., 0, :]
+
+def progress_per_frame(armature, frames):
+    """train_progress at every frame, from its fcurve when it is animated."""
+    action = armature.animation_data.action if armature.animation_data else None
+    fcurve = action.fcurves.find('["train_progress"]') if action else None
+    if fcurve is None:
+        return np.full(len(frames), float(armature.get("train_progress", 0.0)))
+    return np.array([fcurve.evaluate(frame) for frame in frames], dtype=np.float64)
+
+def write_baked_fcurves(action, data_path, frames, values, group, first_index=0):
+    """One fcurve per column of values, every key written with a single foreach_set."""
+    for column in range(values.shape[1]):
+        index = first_index + column
+        fcurve = action.fcurves.find(data_path, index=index)
+        if fcurve is None:
+            fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+        fcurve.keyframe_points.clear()
+        fcurve.keyframe_points.add(len(frames))
+        co = np.empty(len(frames) * 2, dtype=np.float64)
+        co[0::2] = frames
+        co[1::2] = values[:, column]
+        fcurve.keyframe_points.foreach_set("co", co)
+        fcurve.update()
+
+def set_train_constraints_muted(armature, bone_names, mute):
+    """Mute or unmute the constraints of bones, and the drivers on those constraints."""
+    for name in bone_names:
+        pose_bone = armature.pose.bones.get(name)
+        if pose_bone is None:
+            continue
+        for constraint in pose_bone.constraints:
+            constraint.mute = mute
+    prefixes = tuple(f'pose.bones["{name}"].constraints' for name in bone_names)
+    if armature.animation_data:
+        for driver in armature.animation_data.drivers:
+            if driver.data_path.startswith(prefixes):
+                driver.mute = mute
+
+def bake_train(armature, curve, cars, frames, depsgraph):
+    """
+    Key the control bone and the cars along the curve for every frame, then mute their constraints.
+
+    The control bone sits train_progress percent along the curve. Every car
+    sits as far behind or ahead of it along the curve as its head is along the
+    armature's Y axis, keeping its side and height offsets, and points at the
+    next car like the DAMPED_TRACK did.
+
+    :param cars: Pose bones of the cars, in train order
+    :param frames: Frame numbers to key
+    """
+    with rigprofile.stage("curve sampling"):
+        tables = curvesample.curve_tables(curve, depsgraph)
+    if not tables:
+        return 0
+    table = tables[0]
+    control = armature.pose.bones.get("Train_Control")
+    bones = ([control] if control is not None else []) + list(cars)
+    frames = np.asarray(frames, dtype=np.float64)
+
+    with rigprofile.stage("transforms"):
+        rest = np.array([bone.bone.matrix_local for bone in bones], dtype=np.float64)
+        offsets = rest[:, :3, 3]
+        # (frames, bones) arc length of every bone head
+        starts = progress_per_frame(armature, frames) / 100.0 * table.length + armature.get("train_start_offset", 0.0)
+        distances = starts[:, None] + offsets[None, :, 1]
+        positions, tangents = table.at(distances)
+        frames_at = orthonormal_frames(tangents)
+        positions = positions + frames_at[..., :, 0] * offsets[None, :, 0, None] + frames_at[..., :, 2] * offsets[None, :, 2, None]
+        # Cars point at the next car, the control bone and the last car along the curve
+        forward = tangents.copy()
+        first_car = len(bones) - len(cars)
+        forward[:, first_car:-1] = positions[:, first_car + 1:] - positions[:, first_car:-1]
+        world = np.tile(np.eye(4), positions.shape[:2] + (1, 1))
+        world[..., :3, :3] = orthonormal_frames(forward)
+        world[..., :3, 3] = positions
+        to_armature = np.array(armature.matrix_world.inverted(), dtype=np.float64)
+        targets = to_armature @ world
+
+        # Pose basis per bone: rest^-1 @ parent_rest @ parent_pose^-1 @ target
+        index = {bone.name: i for i, bone in enumerate(bones)}
+        basis = np.empty_like(targets)
+        for i, bone in enumerate(bones):
+            local = np.linalg.inv(rest[i])
+            parent = bone.parent
+            if parent is None:
+                basis[:, i] = local @ targets[:, i]
+                continue
+            parent_rest = np.array(parent.bone.matrix_local, dtype=np.float64)
+            ancestor = parent
+            while ancestor is not None and ancestor.name not in index:
+                ancestor = ancestor.parent
+            if ancestor is None:
+                parent_pose = np.array(parent.matrix, dtype=np.float64)
+            else:
+                # Unbaked bones in between, like the Spline IK spacers, keep their rest
+                # offset from the nearest baked ancestor on every frame
+                j = index[ancestor.name]
+                parent_pose = targets[:, j] @ np.linalg.inv(rest[j]) @ parent_rest
+            basis[:, i] = local @ parent_rest @ np.linalg.inv(parent_pose) @ targets[:, i]
+        quaternions = matrices_to_quaternions(basis[..., :3, :3])
+        # Keep neighbouring frames in the same hemisphere so interpolation never flips
+        flips = np.sign(np.einsum('fbk,fbk->fb', quaternions[1:], quaternions[:-1]))
+        flips[flips == 0] = 1
+        quaternions[1:] *= np.cumprod(flips, axis=0)[..., None]
+
+    with rigprofile.stage("keyframes"):
+        animation_data = armature.animation_data or armature.animation_data_create()
+        if animation_data.action is None:
+            animation_data.action = bpy.data.actions.new(f"{armature.name}_TrainBake")
+        action = animation_data.action
+        baked = dict(armature.get(TRAIN_BAKED_KEY, {}))
+        for i, bone in enumerate(bones):
+            baked.setdefault(bone.name, bone.rotation_mode)
+            bone.rotation_mode = 'QUATERNION'
+            path = f'pose.bones["{bone.name}"]'
+            write_baked_fcurves(action, path + ".location", frames, basis[:, i, :3, 3], bone.name)
+            write_baked_fcurves(action, path + ".rotation_quaternion", frames, quaternions[:, i], bone.name)
+        armature[TRAIN_BAKED_KEY] = baked
+        set_train_constraints_muted(armature, list(baked), True)
+    return len(bones)
+
+def unbake_train(armature):
+    """Remove the baked keys, restore rotation modes and unmute the constraints."""
+    baked = dict(armature.get(TRAIN_BAKED_KEY, {}))
+    action = armature.animation_data.action if armature.animation_data else None
+    if action is not None:
+        paths = {f'pose.bones["{name}"].{channel}' for name in baked for channel in ("location", "rotation_quaternion")}
+        for fcurve in [fcurve for fcurve in action.fcurves if fcurve.data_path in paths]:
+            action.fcurves.remove(fcurve)
+    for name, rotation_mode in baked.items():
+        pose_bone = armature.pose.bones.get(name)
+        if pose_bone is not None:
+            pose_bone.location = (0, 0, 0)
+            pose_bone.rotation_quaternion = (1, 0, 0, 0)
+            pose_bone.rotation_mode = rotation_mode
+    set_train_constraints_muted(armature, list(baked), False)
+    armature.pop(TRAIN_BAKED_KEY, None)
+    return len(baked)
+
+def remove_object_and_data(name):
+    obj = bpy.data.objects.get(name)
+    if obj is None:
+        return
+    data = obj.data
+    bpy.data.objects.remove(obj, do_unlink=True)
+    if data is not None and not data.users:
+        bpy.data.meshes.remove(data)
+
+def rig_train_fleet(context, entries, props, frames=None):
+    """
+    Rig every (armature, curve, start offset) entry, then bake them all when frames are given.
+
+    Each train gets its own Train_Path_<armature> plane and guide curves, so
+    trains don't fight over names. A curve shared by several trains is baked
+    once, and its arc length tables are sampled once and reused by every
+    train on it.
+
+    :return: Number of trains rigged
+    """
+    trains = []
+    baked_curves = set()
+    for entry in entries:
+        armature, curve = entry.armature, entry.curve
+        if armature is None or curve is None or armature in (train[0] for train in trains):
+            continue
+        if context.object and context.object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        context.view_layer.objects.active = armature
+        # Pose bone references don't survive edit mode, keep names
+        names = [bone.name for bone in train_cars(armature, selected_only=False)]
+        if len(names) < 2:
+            continue
+
+        with rigprofile.stage("plane"):
+            plane_name = f"Train_Path_{armature.name}"
+            remove_object_and_data(plane_name)
+            locations = [armature.matrix_world @ armature.data.bones[name].head_local for name in names]
+            plane = create_segmented_plane(locations, 1, plane_name)
+        setup_train_rig(armature, plane, curve, entry.start_offset, bake=curve not in baked_curves)
+        baked_curves.add(curve)
+
+        cars = [armature.pose.bones[name] for name in names]
+        with rigprofile.stage("constraints"):
+            if props.rig_mode == 'SPLINE_IK':
+                setup_spline_ik(armature, curve, cars, context.evaluated_depsgraph_get())
+            else:
+                add_bone_constraints(armature, plane, cars, props.loc_axis, props.loc_inverse, props.influence)
+        bpy.ops.object.mode_set(mode='OBJECT')
+        trains.append((armature, curve, names))
+
+    if frames is not None:
+        depsgraph = context.evaluated_depsgraph_get()
+        for armature, curve, names in trains:
+            bake_train(armature, curve, [armature.pose.bones[name] for name in names], frames, depsgraph)
+    return len(trains)
+
 class AddTrainPathOperator(bpy.types.Operator):
     bl_idname = "object.add_train_path"
     bl_label = "Add Train Path"
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
         armature = context.active_object
         if armature.type != 'ARMATURE':
             self.report({'ERROR'}, "Active object must be an armature")
@@ -189,7 +751,8 @@ class AddTrainPathOperator(bpy.types.Operator):
         
         armature_matrix = armature.matrix_world
         bone_locations = [armature_matrix @ bone.head_local for bone in selected_bones]
-        plane = create_segmented_plane(bone_locations, 1)
+        with rigprofile.stage("plane"):
+            plane = create_segmented_plane(bone_locations, 1)
         
         return {'FINISHED'}
 
@@ -199,17 +762,21 @@ class SetupTrainRigOperator(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
         armature = context.active_object
         if armature.type != 'ARMATURE':
             self.report({'ERROR'}, "Active object must be an armature")
             return {'CANCELLED'}
         
-        plane = bpy.data.objects.get("Train_Path")
+        plane = train_plane(armature)
         if not plane:
             self.report({'ERROR'}, "Train_Path object not found")
             return {'CANCELLED'}
         
-        curve = next((obj for obj in bpy.data.objects if obj.type == 'CURVE'), None)
+        curve = train_curve(armature)
         if not curve:
             self.report({'ERROR'}, "No curve found in the scene")
             return {'CANCELLED'}
@@ -224,22 +791,29 @@ class SetupBoneConstraintsOperator(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
         armature = context.active_object
         if armature.type != 'ARMATURE':
             self.report({'ERROR'}, "Active object must be an armature")
             return {'CANCELLED'}
         
-        plane = bpy.data.objects.get("Train_Path")
+        props = context.scene.train_anim_properties
+        if props.rig_mode == 'SPLINE_IK':
+            return self.run_spline_ik(context, armature)
+        
+        plane = train_plane(armature)
         if not plane:
             self.report({'ERROR'}, "Train_Path object not found")
             return {'CANCELLED'}
         
-        curve = next((obj for obj in bpy.data.objects if obj.type == 'CURVE'), None)
+        curve = train_curve(armature)
         if not curve:
             self.report({'ERROR'}, "No curve found in the scene")
             return {'CANCELLED'}
         
-        props = context.scene.train_anim_properties
         setup_bone_constraints(
             armature, 
             plane, 
@@ -250,7 +824,291 @@ class SetupBoneConstraintsOperator(bpy.types.Operator):
         
         return {'FINISHED'}
 
+    def run_spline_ik(self, context, armature):
+        curve = train_curve(armature)
+        if not curve:
+            self.report({'ERROR'}, "No curve found in the scene")
+            return {'CANCELLED'}
+        
+        cars = train_cars(armature)
+        if len(cars) < 2:
+            self.report({'ERROR'}, "At least two bones must be selected")
+            return {'CANCELLED'}
+        
+        curve.data.use_path = True
+        with rigprofile.stage("constraints"):
+            count = setup_spline_ik(armature, curve, cars, context.evaluated_depsgraph_get())
+        self.report({'INFO'}, f"{len(cars)} cars on {count} Spline IK constraint(s)")
+        return {'FINISHED'}
+
+class BakeTrainOperator(bpy.types.Operator):
+    bl_idname = "object.bake_train"
+    bl_label = "Bake Train"
+    bl_description = "Key the train bones along the curve for the scene's frame range and mute their constraints"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
+        armature = context.active_object
+        if armature is None or armature.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object must be an armature")
+            return {'CANCELLED'}
+        
+        curve = train_curve(armature)
+        if not curve:
+            self.report({'ERROR'}, "No curve found in the scene")
+            return {'CANCELLED'}
+        
+        cars = train_cars(armature)
+        scene = context.scene
+        frames = range(scene.frame_start, scene.frame_end + 1)
+        count = bake_train(armature, curve, cars, frames, context.evaluated_depsgraph_get())
+        if not count:
+            self.report({'ERROR'}, "Curve has fewer than two points")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Baked {count} bones over {len(frames)} frames")
+        return {'FINISHED'}
+
+class LiveTrainOperator(bpy.types.Operator):
+    bl_idname = "object.live_train"
+    bl_label = "Live Constraints"
+    bl_description = "Remove the baked train keys and go back to the live constraints"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        armature = context.active_object
+        if armature is None or armature.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object must be an armature")
+            return {'CANCELLED'}
+        count = unbake_train(armature)
+        self.report({'INFO'}, f"{count} bones back on live constraints")
+        return {'FINISHED'}
+
+class WireProgressOperator(bpy.types.Operator):
+    bl_idname = "object.wire_train_progress"
+    bl_label = "Wire Train Progress"
+    bl_description = "Drive the train from train_progress, or key its offsets over the frame range without drivers"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    keyed: bpy.props.BoolProperty(
+        name="Keyed",
+        description="Key the offsets from train_progress instead of driving them. Re-key after changing train_progress",
+        default=True
+    )
+    
+    def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
+        armature = context.active_object
+        if armature is None or armature.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object must be an armature")
+            return {'CANCELLED'}
+        count = wire_progress(armature, context.evaluated_depsgraph_get(), self.keyed)
+        if not count:
+            self.report({'ERROR'}, "Armature has no train rig, run Setup Train Rig first")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"{'Keyed' if self.keyed else 'Drove'} {count} train progress properties")
+        return {'FINISHED'}
+
+class CheckDriversOperator(bpy.types.Operator):
+    bl_idname = "object.check_train_drivers"
+    bl_label = "Check Drivers"
+    bl_description = "List train progress drivers that need Python to evaluate"
+    
+    def execute(self, context):
+        slow = progress_drivers()
+        for name, path, reason in slow:
+            self.report({'WARNING'}, f"{name} {path}: {reason}")
+        if slow:
+            self.report({'WARNING'}, f"{len(slow)} train drivers off the simple expression path")
+        else:
+            self.report({'INFO'}, "All train drivers are simple expressions")
+        return {'FINISHED'}
+
+class StationAddOperator(bpy.types.Operator):
+    bl_idname = "object.train_station_add"
+    bl_label = "Add Station"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        props = context.scene.train_anim_properties
+        station = props.stations.add()
+        if len(props.stations) > 1:
+            station.distance = props.stations[-2].distance
+        props.station_index = len(props.stations) - 1
+        return {'FINISHED'}
+
+class StationRemoveOperator(bpy.types.Operator):
+    bl_idname = "object.train_station_remove"
+    bl_label = "Remove Station"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        props = context.scene.train_anim_properties
+        if 0 <= props.station_index < len(props.stations):
+            props.stations.remove(props.station_index)
+            props.station_index = min(props.station_index, len(props.stations) - 1)
+        return {'FINISHED'}
+
+class SpeedProfileOperator(bpy.types.Operator):
+    bl_idname = "object.train_speed_profile"
+    bl_label = "Key Speed Profile"
+    bl_description = "Key train_progress on every frame from max speed, acceleration, braking and station dwells"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
+        armature = context.active_object
+        if armature is None or armature.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object must be an armature")
+            return {'CANCELLED'}
+        props = context.scene.train_anim_properties
+        length = props.curve_length
+        if length <= 0:
+            curve = train_curve(armature)
+            tables = curvesample.curve_tables(curve, context.evaluated_depsgraph_get()) if curve else []
+            if not tables:
+                self.report({'ERROR'}, "No curve found in the scene, set a curve length")
+                return {'CANCELLED'}
+            length = tables[0].length
+        # Progress 100 is the whole curve past the start offset, the train can only run what is left of it
+        travel = max(length - armature.get("train_start_offset", 0.0), 0.0)
+        
+        scene = context.scene
+        fps = scene.render.fps / scene.render.fps_base
+        stops = [(station.distance, station.dwell) for station in props.stations]
+        with rigprofile.stage("integration"):
+            frames = key_speed_profile(armature, length, travel, props.max_speed, props.acceleration,
+                                       props.deceleration, stops, scene.frame_start, fps)
+        if props.fit_frame_range:
+            scene.frame_end = int(frames[-1])
+        if armature.get("train_progress_keyed"):
+            wire_progress(armature, context.evaluated_depsgraph_get(), keyed=True)
+        self.report({'INFO'}, f"Keyed {len(frames)} frames, {(len(frames) - 1) / fps:.1f} s over {travel:.1f} m")
+        return {'FINISHED'}
+
+class FleetAddOperator(bpy.types.Operator):
+    bl_idname = "object.train_fleet_add"
+    bl_label = "Add Train"
+    bl_description = "Add the active armature and the track curve to the fleet"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        entry = context.scene.train_anim_properties.fleet.add()
+        armature = context.active_object
+        if armature is not None and armature.type == 'ARMATURE':
+            entry.armature = armature
+        entry.curve = find_track_curve()
+        context.scene.train_anim_properties.fleet_index = len(context.scene.train_anim_properties.fleet) - 1
+        return {'FINISHED'}
+
+class FleetRemoveOperator(bpy.types.Operator):
+    bl_idname = "object.train_fleet_remove"
+    bl_label = "Remove Train"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        props = context.scene.train_anim_properties
+        if 0 <= props.fleet_index < len(props.fleet):
+            props.fleet.remove(props.fleet_index)
+            props.fleet_index = min(props.fleet_index, len(props.fleet) - 1)
+        return {'FINISHED'}
+
+class RigFleetOperator(bpy.types.Operator):
+    bl_idname = "object.rig_train_fleet"
+    bl_label = "Rig Fleet"
+    bl_description = "Rig every train of the fleet on its curve, optionally baking them all"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    bake: bpy.props.BoolProperty(
+        name="Bake",
+        description="Bake every train over the scene's frame range after rigging",
+        default=False
+    )
+    
+    def execute(self, context):
+        with rigprofile.run(context, self.bl_idname, 'UNDO' in self.bl_options):
+            return self.run(context)
+
+    def run(self, context):
+        props = context.scene.train_anim_properties
+        armatures = [entry.armature for entry in props.fleet if entry.armature is not None]
+        if len(armatures) != len(set(armatures)):
+            self.report({'WARNING'}, "Armatures listed more than once are rigged once")
+        scene = context.scene
+        frames = range(scene.frame_start, scene.frame_end + 1) if self.bake else None
+        count = rig_train_fleet(context, props.fleet, props, frames)
+        if not count:
+            self.report({'ERROR'}, "No fleet entry has an armature with two bones and a curve")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Rigged {count} trains" + (f", baked over {len(frames)} frames" if frames else ""))
+        return {'FINISHED'}
+
+class TrainFleetEntry(bpy.types.PropertyGroup):
+    armature: bpy.props.PointerProperty(
+        name="Armature",
+        type=bpy.types.Object,
+        poll=lambda self, obj: obj.type == 'ARMATURE'
+    )
+    
+    curve: bpy.props.PointerProperty(
+        name="Curve",
+        type=bpy.types.Object,
+        poll=lambda self, obj: obj.type == 'CURVE' and not obj.get("train_guide")
+    )
+    
+    start_offset: bpy.props.FloatProperty(
+        name="Start Offset",
+        description="Distance along the curve the train starts at",
+        default=0.0,
+        unit='LENGTH'
+    )
+
+class TrainStation(bpy.types.PropertyGroup):
+    distance: bpy.props.FloatProperty(
+        name="Distance",
+        description="Distance along the run the train stops at",
+        default=0.0,
+        min=0.0,
+        unit='LENGTH'
+    )
+    
+    dwell: bpy.props.FloatProperty(
+        name="Dwell",
+        description="Seconds the train waits at the station",
+        default=30.0,
+        min=0.0
+    )
+
+class TRAIN_UL_stations(bpy.types.UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+        row = layout.row(align=True)
+        row.prop(item, "distance")
+        row.prop(item, "dwell")
+
+class TRAIN_UL_fleet(bpy.types.UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+        row = layout.row(align=True)
+        row.prop(item, "armature", text="")
+        row.prop(item, "curve", text="")
+        row.prop(item, "start_offset", text="")
+
 class TrainAnimationProperties(bpy.types.PropertyGroup):
+    rig_mode: bpy.props.EnumProperty(
+        items=[('CONSTRAINTS', 'Per-Bone Constraints', 'Copy Transforms, Copy Location and Damped Track on every car'),
+               ('SPLINE_IK', 'Spline IK', 'One chain following a guide curve with Spline IK, much cheaper per frame')],
+        name="Rig Mode",
+        default='CONSTRAINTS'
+    )
+    
     loc_axis: bpy.props.EnumProperty(
         items=[('X', 'X', 'X Axis'),
                ('Y', 'Y', 'Y Axis'),
@@ -282,6 +1140,49 @@ class TrainAnimationProperties(bpy.types.PropertyGroup):
         min=0.0,
         max=1.0
     )
+    
+    fleet: bpy.props.CollectionProperty(type=TrainFleetEntry)
+    
+    fleet_index: bpy.props.IntProperty(default=0)
+    
+    max_speed: bpy.props.FloatProperty(
+        name="Max Speed",
+        default=20.0,
+        min=0.01,
+        unit='VELOCITY'
+    )
+    
+    acceleration: bpy.props.FloatProperty(
+        name="Acceleration",
+        default=1.0,
+        min=0.001,
+        unit='ACCELERATION'
+    )
+    
+    deceleration: bpy.props.FloatProperty(
+        name="Deceleration",
+        default=1.2,
+        min=0.001,
+        unit='ACCELERATION'
+    )
+    
+    curve_length: bpy.props.FloatProperty(
+        name="Curve Length",
+        description="Distance train_progress 100 stands for, 0 measures the track curve",
+        default=0.0,
+        min=0.0,
+        unit='LENGTH'
+    )
+    
+    fit_frame_range: bpy.props.BoolProperty(
+        name="Fit Frame Range",
+        description="Set the scene end frame to the end of the run",
+        default=True
+    )
+    
+    stations: bpy.props.CollectionProperty(type=TrainStation)
+    
+    station_index: bpy.props.IntProperty(default=0)
 
 class TrainAnimationPanel(bpy.types.Panel):
     bl_label = "Train Animation"
@@ -295,8 +1196,16 @@ class TrainAnimationPanel(bpy.types.Panel):
         layout.operator("object.add_train_path", text="Create Plane")
         layout.operator("object.setup_train_rig", text="Setup Train Rig")
         layout.operator("object.setup_bone_constraints", text="Setup Bone Constraints")
+        row = layout.row(align=True)
+        row.operator("object.bake_train", text="Bake Train", icon='REC')
+        row.operator("object.live_train", text="Live Constraints", icon='CONSTRAINT_BONE')
+        row = layout.row(align=True)
+        row.operator("object.wire_train_progress", text="Drive Progress", icon='DRIVER').keyed = False
+        row.operator("object.wire_train_progress", text="Key Progress", icon='KEYINGSET').keyed = True
+        row.operator("object.check_train_drivers", text="", icon='VIEWZOOM')
         
         props = context.scene.train_anim_properties
+        layout.prop(props, "rig_mode")
         layout.prop(props, "loc_axis")
         layout.prop(props, "loc_inverse")
         layout.prop(props, "influence")
@@ -304,22 +1213,79 @@ class TrainAnimationPanel(bpy.types.Panel):
         armature = context.active_object
         if armature and "train_progress" in armature:
             layout.prop(armature, '["train_progress"]', text="Train Progress")
+        
+        box = layout.box()
+        box.label(text="Speed Profile")
+        column = box.column(align=True)
+        column.prop(props, "max_speed")
+        column.prop(props, "acceleration")
+        column.prop(props, "deceleration")
+        column.prop(props, "curve_length")
+        box.prop(props, "fit_frame_range")
+        row = box.row()
+        row.template_list("TRAIN_UL_stations", "", props, "stations", props, "station_index", rows=3)
+        column = row.column(align=True)
+        column.operator("object.train_station_add", text="", icon='ADD')
+        column.operator("object.train_station_remove", text="", icon='REMOVE')
+        box.operator("object.train_speed_profile", icon='KEYFRAME')
+        
+        box = layout.box()
+        box.label(text="Fleet")
+        row = box.row()
+        row.template_list("TRAIN_UL_fleet", "", props, "fleet", props, "fleet_index", rows=3)
+        column = row.column(align=True)
+        column.operator("object.train_fleet_add", text="", icon='ADD')
+        column.operator("object.train_fleet_remove", text="", icon='REMOVE')
+        row = box.row(align=True)
+        row.operator("object.rig_train_fleet", text="Rig Fleet").bake = False
+        row.operator("object.rig_train_fleet", text="Rig and Bake", icon='REC').bake = True
+        rigprofile.draw(layout, context)
 
 def register():
     bpy.utils.register_class(AddTrainPathOperator)
     bpy.utils.register_class(SetupTrainRigOperator)
     bpy.utils.register_class(SetupBoneConstraintsOperator)
+    bpy.utils.register_class(BakeTrainOperator)
+    bpy.utils.register_class(LiveTrainOperator)
+    bpy.utils.register_class(WireProgressOperator)
+    bpy.utils.register_class(CheckDriversOperator)
+    bpy.utils.register_class(StationAddOperator)
+    bpy.utils.register_class(StationRemoveOperator)
+    bpy.utils.register_class(SpeedProfileOperator)
+    bpy.utils.register_class(FleetAddOperator)
+    bpy.utils.register_class(FleetRemoveOperator)
+    bpy.utils.register_class(RigFleetOperator)
+    bpy.utils.register_class(TrainFleetEntry)
+    bpy.utils.register_class(TrainStation)
+    bpy.utils.register_class(TRAIN_UL_stations)
+    bpy.utils.register_class(TRAIN_UL_fleet)
     bpy.utils.register_class(TrainAnimationProperties)
     bpy.utils.register_class(TrainAnimationPanel)
     bpy.types.Scene.train_anim_properties = bpy.props.PointerProperty(type=TrainAnimationProperties)
+    rigprofile.register()
 
 def unregister():
     bpy.utils.unregister_class(AddTrainPathOperator)
     bpy.utils.unregister_class(SetupTrainRigOperator)
     bpy.utils.unregister_class(SetupBoneConstraintsOperator)
+    bpy.utils.unregister_class(BakeTrainOperator)
+    bpy.utils.unregister_class(LiveTrainOperator)
+    bpy.utils.unregister_class(WireProgressOperator)
+    bpy.utils.unregister_class(CheckDriversOperator)
+    bpy.utils.unregister_class(StationAddOperator)
+    bpy.utils.unregister_class(StationRemoveOperator)
+    bpy.utils.unregister_class(SpeedProfileOperator)
+    bpy.utils.unregister_class(FleetAddOperator)
+    bpy.utils.unregister_class(FleetRemoveOperator)
+    bpy.utils.unregister_class(RigFleetOperator)
     bpy.utils.unregister_class(TrainAnimationPanel)
     bpy.utils.unregister_class(TrainAnimationProperties)
+    bpy.utils.unregister_class(TRAIN_UL_fleet)
+    bpy.utils.unregister_class(TrainFleetEntry)
+    bpy.utils.unregister_class(TRAIN_UL_stations)
+    bpy.utils.unregister_class(TrainStation)
     del bpy.types.Scene.train_anim_properties
+    rigprofile.unregister()
 
 if __name__ == "__main__":
     register()
\ No newline at end of file
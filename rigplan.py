@@ -0,0 +1,460 @@
+import numpy as np
+# Rig planning without bpy or mathutils: bounds, wheel detection, bone
+# placement and parent choice from plain arrays. bonify.py reads the scene
+# into arrays, calls plan_rig and applies the returned RigPlan. Runs in plain
+# CPython and in worker processes, `python rigplan.py 100000` times a
+# synthetic scene.
+
+AXIS_DIRECTIONS = {
+    'X': (1.0, 0.0, 0.0),
+    '-X': (-1.0, 0.0, 0.0),
+    'Y': (0.0, 1.0, 0.0),
+    '-Y': (0.0, -1.0, 0.0),
+    'Z': (0.0, 0.0, 1.0),
+    '-Z': (0.0, 0.0, -1.0),
+}
+
+class RigPlan:
+    """Plain data description of a rig: existing bones followed by the bones to create."""
+
+    def __init__(self, names, heads, tails, rolls, parents, existing, sources):
+        self.names = names
+        self.heads = heads
+        self.tails = tails
+        self.rolls = rolls
+        self.parents = parents
+        # The first `existing` bones are already in the armature
+        self.existing = existing
+        # Source object name of each new bone
+        self.sources = sources
+
+def world_bounds(corners, matrices):
+    """
+    Compute world space bounding boxes for many objects in one array pass.
+
+    :param corners: (n, 8, 3) array of local bounding box corners
+    :param matrices: (n, 4, 4) array of world matrices
+    :return: (centers, dimensions, mins, maxs), each an (n, 3) array
+    """
+    corners = np.asarray(corners, dtype=np.float64).reshape(-1, 8, 3)
+    matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    if not len(corners):
+        empty = np.zeros((0, 3))
+        return empty, empty, empty, empty
+    world = np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+    mins = world.min(axis=1)
+    maxs = world.max(axis=1)
+    return world.mean(axis=1), maxs - mins, mins, maxs
+
+def wheel_shape_mask(dimensions):
+    """Classify (n, 3) world dimensions as wheel shaped: round in XZ and thinner along Y."""
+    x, y, z = dimensions[:, 0], dimensions[:, 1], dimensions[:, 2]
+    return (np.abs(x - z) < 0.001) & (y < np.minimum(x, z))
+
+def bone_placements(centers, dimensions, wheels, to_armature, full_length=False):
+    """
+    Place one bone per object: along Z for wheels, along Y for everything else.
+
+    :param centers: (n, 3) world centers of the objects
+    :param dimensions: (n, 3) world dimensions of the objects
+    :param wheels: (n,) bool array, True for wheels
+    :param to_armature: (4, 4) inverse world matrix of the armature
+    :param full_length: Center the bones on the objects instead of starting at their centers
+    :return: (heads, tails, rolls), heads and tails as (n, 3) arrays in armature space
+    """
+    to_armature = np.asarray(to_armature, dtype=np.float64)
+    obj_locs = centers @ to_armature[:3, :3].T + to_armature[:3, 3]
+
+    bone_lengths = np.where(wheels, np.maximum(dimensions[:, 0], dimensions[:, 2]), dimensions[:, 1])
+    bone_dirs = np.zeros_like(obj_locs)
+    bone_dirs[:, 2] = wheels
+    bone_dirs[:, 1] = ~wheels
+    offsets = bone_dirs * bone_lengths[:, None]
+
+    if full_length:
+        heads = obj_locs - offsets / 2
+        tails = obj_locs + offsets / 2
+    else:
+        heads = obj_locs
+        tails = obj_locs + offsets
+    return heads, tails, np.zeros(len(heads))
+
+def plan_rig(names, heads, tails, root, new_names, centers, dimensions, wheels, to_armature,
+             full_length=False, main_chain_cutoff=36.0, parent=None, axes=None):
+    """
+    Plan a rig: the armature's bones plus one new bone per object, and every parent.
+
+    :param names: Names of the bones already in the armature
+    :param heads: (b, 3) heads of those bones in armature space
+    :param tails: (b, 3) tails of those bones in armature space
+    :param root: Index of the existing root bone, or None
+    :param new_names: Name of each object, also the name of its bone
+    :param centers: (n, 3) world centers of the objects, see world_bounds
+    :param dimensions: (n, 3) world dimensions of the objects
+    :param wheels: (n,) bool array, True for wheels
+    :param to_armature: (4, 4) inverse world matrix of the armature
+    :param parent: Index of the manually selected parent bone
+    :param axes: Keys of AXIS_DIRECTIONS
+    :return: RigPlan
+    """
+    heads = np.asarray(heads, dtype=np.float64).reshape(-1, 3)
+    tails = np.asarray(tails, dtype=np.float64).reshape(-1, 3)
+    new_heads, new_tails, new_rolls = bone_placements(centers, dimensions, wheels, to_armature, full_length)
+    all_heads = np.concatenate((heads, new_heads))
+    all_tails = np.concatenate((tails, new_tails))
+    rolls = np.concatenate((np.zeros(len(heads)), new_rolls))
+    parents = plan_hierarchy(all_heads, all_tails, root, main_chain_cutoff, parent, axes)
+    return RigPlan(list(names) + list(new_names), all_heads, all_tails, rolls, parents, len(names), list(new_names))
+
+def classify_sources(records, fingerprints, bones, alive):
+    """
+    Compare the objects being rigged against the mapping stored by the last run.
+
+    An object without a record whose name is already a free bone adopts that
+    bone instead of getting a duplicate.
+
+    :param records: Object name -> (bone name, fingerprint) from earlier runs
+    :param fingerprints: Object name -> current fingerprint, for the objects being rigged
+    :param bones: Names of the bones in the armature
+    :param alive: Names of recorded objects that still exist
+    :return: (unchanged, changed, new, removed): a list of object names, an object -> bone dict,
+             a list of object names and an object -> bone dict of records whose object is gone
+    """
+    removed = {name: bone for name, (bone, _) in records.items() if name not in alive and bone in bones}
+    claimed = {bone for name, (bone, _) in records.items() if name in alive and bone in bones}
+    unchanged, changed, new = [], {}, []
+    for name, fingerprint in fingerprints.items():
+        record = records.get(name)
+        if record is not None and record[0] in bones:
+            if record[1] == fingerprint:
+                unchanged.append(name)
+            else:
+                changed[name] = record[0]
+        elif name in bones and name not in claimed:
+            changed[name] = name
+            claimed.add(name)
+        else:
+            new.append(name)
+    return unchanged, changed, new, removed
+
+def plan_hierarchy(heads, tails, root=None, main_chain_cutoff=36.0, parent=None, axes=None):
+    """
+    Compute a parent for every bone from plain head/tail arrays.
+
+    Bones shorter than the main chain cutoff go inside the longest bone
+    containing them when there is one. The rest go under the manually selected
+    parent bone, else the closest bone along the axes, else they are chained
+    by Y position.
+
+    :param heads: (n, 3) array of bone heads in armature space
+    :param tails: (n, 3) array of bone tails in armature space
+    :param root: Index of the existing root bone, which keeps no parent
+    :param main_chain_cutoff: Percentage of the longest bone's length
+    :param parent: Index of the manually selected parent bone
+    :param axes: Keys of AXIS_DIRECTIONS
+    :return: List of parent indices, None for bones without a parent
+    """
+    count = len(heads)
+    parents = [None] * count
+    if not count:
+        return parents
+
+    index = BoneSegmentIndex(heads, tails)
+    cutoff = index.lengths.max() * main_chain_cutoff / 100.0
+    chain = []
+    for i in range(count):
+        if i == root:
+            continue
+        parent_index = find_potential_parent(index, i) if index.lengths[i] < cutoff else None
+        if parent_index is None:
+            chain.append(i)
+        else:
+            parents[i] = parent_index
+
+    if parent is not None:
+        for i in chain:
+            parents[i] = parent
+        # The selected parent hangs off the root so nothing can loop back to it
+        if parent != root:
+            parents[parent] = root
+    elif axes:
+        candidates = chain + ([root] if root is not None else [])
+        axis_parents = parent_by_axes(heads[candidates], len(chain), axes)
+        for i, parent_index in zip(chain, axis_parents):
+            parents[i] = candidates[parent_index] if parent_index is not None else root
+    else:
+        sorted_bones = sorted(chain, key=lambda i: heads[i][1])
+        for position, i in enumerate(sorted_bones):
+            parents[i] = sorted_bones[position - 1] if position > 0 else root
+    return parents
+
+class GridIndex:
+    """
+    Uniform grid over points, the NumPy stand-in for mathutils.kdtree.
+
+    Points are sorted by cell key once, a radius query looks up the cells
+    overlapping its box with one searchsorted and filters them by distance.
+    """
+
+    def __init__(self, points, cell=None):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        count = len(self.points)
+        self.origin = self.points.min(axis=0) if count else np.zeros(3)
+        extent = self.points.max(axis=0) - self.origin if count else np.zeros(3)
+        if cell is None:
+            # About one point per cell over the axes the points actually spread along
+            spread = extent[extent > 1e-9]
+            cell = (np.prod(spread) / max(count, 1)) ** (1.0 / len(spread)) if len(spread) else 1.0
+        self.cell = max(float(cell), 1e-9)
+        self.shape = np.floor(extent / self.cell).astype(np.int64) + 1
+        self.extent = extent
+
+        keys = self.keys(np.floor((self.points - self.origin) / self.cell).astype(np.int64))
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_keys, self.starts, counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.ends = self.starts + counts
+
+    def keys(self, cells):
+        return (cells[..., 0] * self.shape[1] + cells[..., 1]) * self.shape[2] + cells[..., 2]
+
+    def candidates(self, point, radius):
+        """Indices of points in the cells overlapping the box of radius around point."""
+        lo = np.maximum(np.floor((point - radius - self.origin) / self.cell).astype(np.int64), 0)
+        hi = np.minimum(np.floor((point + radius - self.origin) / self.cell).astype(np.int64), self.shape - 1)
+        if (hi < lo).any():
+            return np.zeros(0, dtype=np.int64)
+        if np.prod(hi - lo + 1) >= len(self.cell_keys):
+            return np.arange(len(self.points))
+        axes = [np.arange(lo[axis], hi[axis] + 1) for axis in range(3)]
+        keys = self.keys(np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3))
+        found = np.searchsorted(self.cell_keys, keys)
+        valid = found < len(self.cell_keys)
+        valid[valid] = self.cell_keys[found[valid]] == keys[valid]
+        found = found[valid]
+        starts, ends = self.starts[found], self.ends[found]
+        lengths = ends - starts
+        # Concatenated ranges starts[i]:ends[i] without a Python loop
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self.order[positions]
+
+    def within(self, point, radius):
+        """Indices of points within radius of point."""
+        point = np.asarray(point, dtype=np.float64)
+        candidates = self.candidates(point, radius)
+        distances = np.linalg.norm(self.points[candidates] - point, axis=1)
+        return candidates[distances <= radius]
+
+class BoneSegmentIndex:
+    """
+    Spatial index over bone segments, built once per generate run.
+
+    Every bone is sampled along its length and the samples go into one
+    GridIndex, so finding the bones near a point is a bounded-radius query
+    instead of a scan over the whole armature.
+    """
+    max_samples_per_bone = 32
+
+    def __init__(self, heads, tails):
+        self.heads = np.asarray(heads, dtype=np.float64).reshape(-1, 3)
+        self.tails = np.asarray(tails, dtype=np.float64).reshape(-1, 3)
+        self.vectors = self.tails - self.heads
+        self.lengths = np.linalg.norm(self.vectors, axis=1)
+
+        positive = self.lengths[self.lengths > 0]
+        step = np.median(positive) / 2 if len(positive) else 1.0
+        counts = np.clip(np.ceil(self.lengths / step).astype(int) + 1, 2, self.max_samples_per_bone)
+        # Any point on a segment is at most half a sample gap from a sample
+        self.sample_gap = float((self.lengths / (counts - 1)).max()) / 2 if len(counts) else 0.0
+
+        self.sample_owner = np.repeat(np.arange(len(counts)), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        t = (np.arange(len(self.sample_owner)) - starts) / (counts - 1)[self.sample_owner]
+        samples = self.heads[self.sample_owner] + self.vectors[self.sample_owner] * t[:, None]
+        # Typical queries reach about one median bone length
+        self.grid = GridIndex(samples, cell=step * 2)
+
+    def midpoint(self, i):
+        return (self.heads[i] + self.tails[i]) / 2
+
+    def bones_near(self, point, radius):
+        """Indices of bones whose segment comes within radius of point."""
+        hits = self.grid.within(point, radius + self.sample_gap)
+        candidates = np.unique(self.sample_owner[hits])
+        if not len(candidates):
+            return candidates
+        point = np.asarray(point, dtype=np.float64)
+        vectors = self.vectors[candidates]
+        offsets = point - self.heads[candidates]
+        length_sq = np.maximum((vectors * vectors).sum(axis=1), 1e-12)
+        t = np.clip((offsets * vectors).sum(axis=1) / length_sq, 0.0, 1.0)
+        distances = np.linalg.norm(offsets - vectors * t[:, None], axis=1)
+        return candidates[distances <= radius]
+
+def find_potential_parent(index, child, radius=None):
+    """
+    Find a potential parent for a bone: the longest bone containing its midpoint.
+
+    :param index: BoneSegmentIndex over the armature's bones
+    :param child: Index of the child bone in the index
+    :param radius: How far the midpoint may be from a parent's segment, defaults to the child's length
+    :return: Index of the parent bone, or None
+    """
+    child_length = index.lengths[child]
+    if radius is None:
+        radius = child_length
+    child_midpoint = index.midpoint(child)
+    candidates = index.bones_near(child_midpoint, radius)
+
+    # Only strictly longer bones (ties broken by index) so parenting never forms a cycle
+    lengths = index.lengths[candidates]
+    longer = (lengths > child_length) | ((lengths == child_length) & (candidates > child))
+    candidates = candidates[longer]
+    if not len(candidates):
+        return None
+
+    # The midpoint projects onto the candidate within its length, on the candidates only
+    vectors = index.vectors[candidates]
+    offsets = child_midpoint - index.heads[candidates]
+    length_sq = np.maximum((vectors * vectors).sum(axis=1), 1e-12)
+    inside = np.abs((offsets * vectors).sum(axis=1)) / length_sq <= 1.0
+    candidates = candidates[inside]
+    if not len(candidates):
+        return None
+    return int(candidates[np.argmax(index.lengths[candidates])])
+
+class DirectionalBoneIndex:
+    """
+    Grid over bone heads answering "the nearest bone in the +Z / -X / ... half-space".
+
+    Heads are also sorted along each axis, so the heads inside the requested
+    half-spaces are counted with a searchsorted. No heads ends the query at
+    once, and a few heads (a flat layout asked for +Z) are compared directly.
+    Otherwise the search radius doubles from the nearest point of the
+    half-space bounds until a bone within it lies in an allowed half-space,
+    so a query only visits bones about as close as its answer.
+    """
+    # Heads in the half-spaces up to which a direct comparison beats the grid
+    brute_force_limit = 256
+
+    def __init__(self, heads):
+        self.heads = np.asarray(heads, dtype=np.float64).reshape(-1, 3)
+        self.grid = GridIndex(self.heads)
+        self.axis_order = [np.argsort(self.heads[:, k], kind='stable') for k in range(3)]
+        self.axis_values = [self.heads[order, k] for k, order in enumerate(self.axis_order)]
+
+    def in_front(self, point, axes):
+        """Per axis, indices of the heads strictly beyond point along it, with the bounds of those heads."""
+        fronts = []
+        for axis in axes:
+            direction = np.array(AXIS_DIRECTIONS[axis])
+            k = int(np.argmax(np.abs(direction)))
+            values, order = self.axis_values[k], self.axis_order[k]
+            if direction[k] > 0:
+                first = np.searchsorted(values, point[k] + 1e-9, side='right')
+                indices, low, high = order[first:], first, len(values) - 1
+            else:
+                last = np.searchsorted(values, point[k] - 1e-9, side='left')
+                indices, low, high = order[:last], 0, last - 1
+            if len(indices):
+                lo, hi = self.grid.origin.copy(), self.grid.origin + self.grid.extent
+                lo[k], hi[k] = values[low], values[high]
+                fronts.append((indices, lo, hi))
+        return fronts
+
+    def nearest(self, point, axes, accept=None):
+        """
+        Find the closest bone head in any of the half-spaces of the given axes.
+
+        :param point: Where to search from
+        :param axes: Keys of AXIS_DIRECTIONS, e.g. {'Z', '-X'}
+        :param accept: Optional callable taking a bone index, to reject candidates
+        :return: Index of the bone, or None
+        """
+        if not len(self.heads) or not axes:
+            return None
+        point = np.asarray(point, dtype=np.float64)
+        fronts = self.in_front(point, axes)
+        if not fronts:
+            return None
+        directions = np.array([AXIS_DIRECTIONS[axis] for axis in axes])
+
+        if sum(len(indices) for indices, _, _ in fronts) <= self.brute_force_limit:
+            indices = np.unique(np.concatenate([indices for indices, _, _ in fronts]))
+            distances = np.linalg.norm(self.heads[indices] - point, axis=1)
+            for i in indices[np.lexsort((indices, distances))]:
+                if accept is None or accept(int(i)):
+                    return int(i)
+            return None
+
+        # Every candidate lies in the bounds of a half-space: start at the closest and stop past the farthest
+        nearest_box = min(np.linalg.norm(point - np.clip(point, lo, hi)) for _, lo, hi in fronts)
+        reach = max(np.linalg.norm(np.maximum(np.abs(point - lo), np.abs(point - hi))) for _, lo, hi in fronts)
+        radius = max(self.grid.cell, nearest_box)
+        rejected = set()
+        while True:
+            indices = self.grid.within(point, radius)
+            offsets = self.heads[indices] - point
+            in_front = (offsets @ directions.T > 1e-9).any(axis=1)
+            indices, offsets = indices[in_front], offsets[in_front]
+            distances = np.linalg.norm(offsets, axis=1)
+            for i in indices[np.lexsort((indices, distances))]:
+                i = int(i)
+                if i in rejected:
+                    continue
+                if accept is None or accept(i):
+                    return i
+                rejected.add(i)
+            if radius >= reach:
+                return None
+            radius = min(radius * 2, reach)
+
+def parent_by_axes(heads, count, axes):
+    """
+    Pick a parent for each of the first count bones: the nearest bone in the axes' half-spaces.
+
+    Candidates that would close a cycle are skipped, tracked with a union-find
+    whose sets remember their root bone.
+
+    :param heads: (n, 3) array of bone heads, the first count are children, the rest are only candidates
+    :param count: Number of bones to find parents for
+    :param axes: Keys of AXIS_DIRECTIONS
+    :return: List of parent indices into heads, None where nothing was found
+    """
+    index = DirectionalBoneIndex(heads)
+    sets = list(range(len(index.heads)))
+    tops = list(range(len(index.heads)))
+
+    def find(i):
+        while sets[i] != i:
+            sets[i] = sets[sets[i]]
+            i = sets[i]
+        return i
+
+    parents = []
+    for child in range(count):
+        parent = index.nearest(index.heads[child], axes, accept=lambda i: tops[find(i)] != child)
+        if parent is not None:
+            child_set, parent_set = find(child), find(parent)
+            sets[child_set] = parent_set
+        parents.append(parent)
+    return parents
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = np.random.default_rng(0)
+    side = count ** (1 / 3) * 4
+    corners = np.array([(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+    matrices = np.tile(np.eye(4), (count, 1, 1))
+    matrices[:, :3, 3] = rng.uniform(0, side, (count, 3))
+    matrices[:, 1, 1] = rng.uniform(0.5, 4.0, count)
+
+    for axes in (None, {'Z', '-X'}):
+        start = time.perf_counter()
+        centers, dimensions, _, _ = world_bounds(np.broadcast_to(corners, (count, 8, 3)), matrices)
+        plan = plan_rig(["Root"], [(0, 0, 0)], [(0, 1, 0)], 0, [f"Part_{i}" for i in range(count)],
+                        centers, dimensions, wheel_shape_mask(dimensions), np.eye(4), axes=axes)
+        print(f"{count} objects, axes {sorted(axes) if axes else 'Y chain'}: {time.perf_counter() - start:.3f} s, "
+              f"{sum(parent is None for parent in plan.parents)} roots")
@@ -0,0 +1,169 @@
+import bpy
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+# Opt-in profiling for the bonify and train operators. Off unless the scene's
+# Profile Operators box is ticked or BONIFY_PROFILE=1 is set, and then every
+# operator run records per-stage wall time, bpy.ops calls, mode switches and
+# undo pushes. The last run shows in the panels and is written as JSON next
+# to the .blend, with an optional cProfile dump beside it.
+
+class RunProfile:
+    """Timings and counters of one operator run."""
+
+    def __init__(self, label):
+        self.label = label
+        # Stage name to seconds, in the order the stages first ran
+        self.stages = {}
+        # Operator idname to number of calls
+        self.ops = {}
+        self.undo_pushes = 0
+        self.seconds = 0.0
+        self.report_path = None
+        self.cprofile_path = None
+
+    @property
+    def mode_switches(self):
+        return self.ops.get("object.mode_set", 0)
+
+    def as_dict(self):
+        return {
+            "label": self.label,
+            "seconds": self.seconds,
+            "stages": self.stages,
+            "ops_calls": sum(self.ops.values()),
+            "ops": self.ops,
+            "mode_switches": self.mode_switches,
+            "undo_pushes": self.undo_pushes,
+            "cprofile": self.cprofile_path,
+        }
+
+# Profile being recorded, None when profiling is off or between runs
+current = None
+# Last finished profile, drawn in the panels
+last_run = None
+
+def profiling_enabled(context):
+    return os.environ.get("BONIFY_PROFILE") == "1" or getattr(context.scene, "bonify_profile", False)
+
+def cprofile_enabled(context):
+    return os.environ.get("BONIFY_PROFILE_CPROFILE") == "1" or getattr(context.scene, "bonify_profile_cprofile", False)
+
+@contextmanager
+def stage(name):
+    """Add the wall time of the block to a stage of the current run. Free when not profiling."""
+    profile = current
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages[name] = profile.stages.get(name, 0.0) + time.perf_counter() - start
+
+def _counting_call(original):
+    def call(self, *args, **kwargs):
+        if current is not None:
+            name = self.idname_py()
+            current.ops[name] = current.ops.get(name, 0) + 1
+            # Operators called from a script only push an undo step when their positional undo flag is set
+            if name == "ed.undo_push" or any(arg is True for arg in args):
+                current.undo_pushes += 1
+        return original(self, *args, **kwargs)
+    return call
+
+def report_path(suffix):
+    """File next to the .blend, or in Blender's temp directory for unsaved files."""
+    if bpy.data.filepath:
+        return os.path.splitext(bpy.data.filepath)[0] + suffix
+    return os.path.join(bpy.app.tempdir, "untitled" + suffix)
+
+def write_report(profile, profiler=None):
+    try:
+        if profiler is not None:
+            profile.cprofile_path = report_path(".bonify_profile.prof")
+            profiler.dump_stats(profile.cprofile_path)
+        profile.report_path = report_path(".bonify_profile.json")
+        with open(profile.report_path, "w") as f:
+            json.dump(profile.as_dict(), f, indent=2)
+    except OSError as e:
+        print(f"Could not write profile report: {e}")
+        profile.report_path = None
+
+@contextmanager
+def run(context, label, undo=False):
+    """
+    Profile one operator run when profiling is enabled. Nested runs fold into the outer one.
+
+    :param label: Name of the run, usually the operator's bl_idname
+    :param undo: The operator pushes an undo step when it finishes
+    :return: The RunProfile being recorded, or None
+    """
+    global current, last_run
+    if current is not None or not profiling_enabled(context):
+        yield None
+        return
+
+    profile = RunProfile(label)
+    profile.undo_pushes = int(undo)
+    profiler = cProfile.Profile() if cprofile_enabled(context) else None
+    # Every bpy.ops.x.y(...) goes through this class, count calls by wrapping it for the run
+    op_class = getattr(bpy.ops, "_BPyOpsSubModOp", None)
+    original = op_class.__call__ if op_class is not None else None
+    if op_class is not None:
+        op_class.__call__ = _counting_call(original)
+    current = profile
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        profile.seconds = time.perf_counter() - start
+        current = None
+        if op_class is not None:
+            op_class.__call__ = original
+        last_run = profile
+        write_report(profile, profiler)
+
+def draw(layout, context):
+    """Profiling toggles and the breakdown of the last run."""
+    box = layout.box()
+    row = box.row()
+    row.prop(context.scene, "bonify_profile", text="Profile Operators")
+    if context.scene.bonify_profile:
+        row.prop(context.scene, "bonify_profile_cprofile", text="cProfile")
+    if last_run is None:
+        return
+    box.label(text=f"{last_run.label}: {last_run.seconds:.3f} s")
+    for name, seconds in last_run.stages.items():
+        box.label(text=f"    {name}: {seconds:.3f} s")
+    box.label(text=f"{sum(last_run.ops.values())} ops, {last_run.mode_switches} mode switches, "
+                   f"{last_run.undo_pushes} undo pushes")
+    if last_run.report_path:
+        box.label(text=os.path.basename(last_run.report_path), icon='FILE')
+
+def register():
+    # Shared by bonify and the train scripts, whichever registers first adds the properties
+    if hasattr(bpy.types.Scene, "bonify_profile"):
+        return
+    bpy.types.Scene.bonify_profile = bpy.props.BoolProperty(
+        name="Profile Operators",
+        description="Record stage timings and operator counts of every run, written next to the .blend",
+        default=False
+    )
+    bpy.types.Scene.bonify_profile_cprofile = bpy.props.BoolProperty(
+        name="cProfile",
+        description="Also run the operators under cProfile and dump the stats next to the .blend",
+        default=False
+    )
+
+def unregister():
+    if hasattr(bpy.types.Scene, "bonify_profile"):
+        del bpy.types.Scene.bonify_profile
+        del bpy.types.Scene.bonify_profile_cprofile
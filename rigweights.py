@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+# Weight solving without bpy, so it can run in worker processes.
+
+# Bones kept per vertex, and the exponent of the inverse distance falloff
+DISTANCE_WEIGHT_INFLUENCES = 4
+DISTANCE_WEIGHT_FALLOFF = 2.0
+# Below this many vertices in total, starting workers costs more than it saves
+PARALLEL_MIN_VERTICES = 100000
+# Working memory of one chunk, vertices per chunk shrink as bones grow
+WEIGHT_CHUNK_BYTES = 128 * 2 ** 20
+# float32 offsets (12) and projections (4), squared distances (4), a temporary (4), argpartition (8)
+BYTES_PER_VERTEX_BONE = 32
+
+def chunk_vertices(bone_count, budget=WEIGHT_CHUNK_BYTES):
+    """Vertices per array pass keeping a pass within budget bytes against bone_count bones."""
+    return max(1, budget // (BYTES_PER_VERTEX_BONE * max(bone_count, 1)))
+
+def solve_distance_weights(coords, heads, tails, influences=DISTANCE_WEIGHT_INFLUENCES,
+                           falloff=DISTANCE_WEIGHT_FALLOFF, chunk_size=None):
+    """
+    Weight vertices by their distance to bone segments.
+
+    Keeps the closest bones per vertex, weights them by inverse distance and
+    normalizes. Works in float32 on chunks of vertices sized from
+    WEIGHT_CHUNK_BYTES and the bone count, updating arrays in place, so a
+    pass stays within that budget however many bones there are.
+
+    :param coords: (v, 3) array of vertex positions in armature space
+    :param heads: (b, 3) array of bone heads
+    :param tails: (b, 3) array of bone tails
+    :param influences: Number of bones kept per vertex
+    :param falloff: Exponent of the inverse distance falloff
+    :param chunk_size: Vertices processed per array pass, derived from the bone count by default
+    :return: (bone indices, weights), both (v, k) arrays
+    """
+    heads = np.asarray(heads, dtype=np.float32)
+    vectors = np.asarray(tails, dtype=np.float32) - heads
+    length_sq = np.maximum((vectors * vectors).sum(axis=1), 1e-12)
+    k = min(influences, len(heads))
+    chunk_size = chunk_size or chunk_vertices(len(heads))
+    indices = np.zeros((len(coords), k), dtype=np.int32)
+    weights = np.zeros((len(coords), k), dtype=np.float32)
+    for start in range(0, len(coords), chunk_size):
+        points = np.asarray(coords[start:start + chunk_size], dtype=np.float32)
+        offsets = points[:, None, :] - heads[None, :, :]
+        t = np.einsum('cbk,bk->cb', offsets, vectors)
+        t /= length_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        # Offset from the closest point of each segment, one axis at a time to keep temporaries (c, b)
+        for axis in range(3):
+            offsets[:, :, axis] -= t * vectors[:, axis]
+        del t
+        distances = np.einsum('cbk,cbk->cb', offsets, offsets)
+        del offsets
+
+        closest = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < len(heads) else \
+            np.broadcast_to(np.arange(k), (len(points), k))
+        closest_distances = np.sqrt(np.take_along_axis(distances, closest, axis=1), dtype=np.float64)
+        influence = 1.0 / np.maximum(closest_distances, 1e-6) ** falloff
+        indices[start:start + chunk_size] = closest
+        weights[start:start + chunk_size] = influence / influence.sum(axis=1, keepdims=True)
+    return indices, weights
+
+def job_memory(job, influences=DISTANCE_WEIGHT_INFLUENCES):
+    """Peak bytes one worker needs for a (coords, heads, tails) job: its arrays plus one chunk pass."""
+    coords, heads = job[0], job[1]
+    vertices, bones = len(coords), len(heads)
+    chunk = min(vertices, chunk_vertices(bones))
+    return vertices * 3 * 8 + chunk * bones * BYTES_PER_VERTEX_BONE + vertices * influences * 8
+
+def pool_memory_budget():
+    """Bytes the worker pool may use: $BONIFY_WEIGHT_MEMORY_MB, else half the physical memory."""
+    megabytes = int(os.environ.get("BONIFY_WEIGHT_MEMORY_MB", 0))
+    if megabytes:
+        return megabytes * 2 ** 20
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        # No sysconf on Windows, assume a modest machine
+        return 8 * 2 ** 30
+
+def _solve_job(job):
+    return solve_distance_weights(*job)
+
+def solve_many(jobs, workers=None):
+    """
+    Solve many (coords, heads, tails) jobs, one per mesh.
+
+    Large batches are spread over a process pool, small ones or a failing
+    pool fall back to solving in this process.
+
+    :param jobs: List of (coords, heads, tails) array tuples
+    :param workers: Number of worker processes, defaults to $BONIFY_WEIGHT_WORKERS or the CPU count,
+                    capped so the biggest jobs running at once fit pool_memory_budget
+    :return: List of (bone indices, weights), in job order
+    """
+    workers = workers or int(os.environ.get("BONIFY_WEIGHT_WORKERS", 0)) or os.cpu_count() or 1
+    if jobs:
+        workers = min(workers, max(1, pool_memory_budget() // max(job_memory(job) for job in jobs)))
+    total = sum(len(job[0]) for job in jobs)
+    if workers < 2 or len(jobs) < 2 or total < PARALLEL_MIN_VERTICES:
+        return [_solve_job(job) for job in jobs]
+
+    # Spawned workers re-run __main__, which inside Blender is a script that
+    # imports bpy. Give them an empty one; they only need this module.
+    main = sys.modules.get('__main__')
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+            # Biggest meshes first so one straggler doesn't hold up the batch
+            order = sorted(range(len(jobs)), key=lambda i: -len(jobs[i][0]))
+            solved = pool.map(_solve_job, [jobs[i] for i in order])
+            results = [None] * len(jobs)
+            for i, result in zip(order, solved):
+                results[i] = result
+            return results
+    except Exception as e:
+        print(f"Weight worker pool failed, solving in process: {e}")
+        return [_solve_job(job) for job in jobs]
+    finally:
+        if main is not None:
+            sys.modules['__main__'] = main
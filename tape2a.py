@@ -1,31 +1,27 @@
 import bpy
-import bmesh
-from mathutils import Vector, Matrix
+import numpy as np
 # Function to create the segmented plane
 def create_segmented_plane(bone_locations, width):
     mesh = bpy.data.meshes.new("Train_Path")
     plane = bpy.data.objects.new("Train_Path", mesh)
     bpy.context.collection.objects.link(plane)
     
-    bm = bmesh.new()
+    # Two vertices per bone, +X then -X, and a quad between neighbouring pairs, built as arrays in one pass
+    locations = np.array(bone_locations, dtype=np.float64).reshape(-1, 3)
+    count = len(locations)
     half_width = width / 2
+    verts = np.repeat(locations, 2, axis=0)
+    verts[0::2, 0] += half_width
+    verts[1::2, 0] -= half_width
+    starts = np.arange(count - 1) * 2
+    quads = np.stack((starts, starts + 1, starts + 3, starts + 2), axis=1)
+    # Faces bring their edges, a single pair needs its edge spelled out
+    edges = [(0, 1)] if count == 1 else []
+    mesh.from_pydata(verts.tolist(), edges, quads.tolist())
     
-    for i, location in enumerate(bone_locations):
-        v1 = bm.verts.new(location + Vector((half_width, 0, 0)))
-        v2 = bm.verts.new(location + Vector((-half_width, 0, 0)))
-        bm.verts.ensure_lookup_table()
-        
-        bm.edges.new((v1, v2))
-        
-        if i > 0:
-            bm.faces.new((bm.verts[-4], bm.verts[-3], bm.verts[-1], bm.verts[-2]))
-    
-    bm.to_mesh(mesh)
-    bm.free()
-    
-    for i in range(len(bone_locations)):
+    for i, pair in enumerate(np.arange(count * 2).reshape(-1, 2).tolist()):
         vg = plane.vertex_groups.new(name=f"Bone_{i+1}")
-        vg.add([i*2, i*2+1], 1.0, 'REPLACE')
+        vg.add(pair, 1.0, 'REPLACE')
     
     return plane
 
@@ -0,0 +1,211 @@
+import time
+
+import numpy as np
+import pytest
+
+import rigplan
+from rigplan import (AXIS_DIRECTIONS, BoneSegmentIndex, DirectionalBoneIndex, GridIndex, classify_sources,
+                     find_potential_parent, parent_by_axes, plan_hierarchy, world_bounds)
+
+def random_bones(rng, count, side=20.0):
+    heads = rng.uniform(0, side, (count, 3))
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    tails = heads + directions * rng.uniform(0.2, 6.0, count)[:, None]
+    return heads, tails
+
+def segment_distance(point, head, tail):
+    vector = tail - head
+    t = np.clip(np.dot(point - head, vector) / max(np.dot(vector, vector), 1e-12), 0.0, 1.0)
+    return np.linalg.norm(point - head - vector * t)
+
+def assert_acyclic(parents):
+    for start in range(len(parents)):
+        seen = set()
+        i = start
+        while i is not None:
+            assert i not in seen, f"cycle through bone {i}"
+            seen.add(i)
+            i = parents[i]
+
+def brute_potential_parent(heads, tails, child):
+    lengths = np.linalg.norm(tails - heads, axis=1)
+    midpoint = (heads[child] + tails[child]) / 2
+    best = None
+    for j in range(len(heads)):
+        longer = lengths[j] > lengths[child] or (lengths[j] == lengths[child] and j > child)
+        if not longer or segment_distance(midpoint, heads[j], tails[j]) > lengths[child]:
+            continue
+        vector = tails[j] - heads[j]
+        if abs(np.dot(midpoint - heads[j], vector)) / max(np.dot(vector, vector), 1e-12) > 1.0:
+            continue
+        if best is None or lengths[j] > lengths[best]:
+            best = j
+    return best
+
+def test_world_bounds_matches_per_object_loop():
+    rng = np.random.default_rng(1)
+    corners = rng.uniform(-1, 1, (20, 8, 3))
+    matrices = np.tile(np.eye(4), (20, 1, 1))
+    matrices[:, :3, :3] = rng.normal(size=(20, 3, 3))
+    matrices[:, :3, 3] = rng.uniform(-10, 10, (20, 3))
+
+    centers, dimensions, mins, maxs = world_bounds(corners, matrices)
+    for i in range(20):
+        world = np.array([matrices[i] @ np.append(corner, 1.0) for corner in corners[i]])[:, :3]
+        np.testing.assert_allclose(mins[i], world.min(axis=0))
+        np.testing.assert_allclose(maxs[i], world.max(axis=0))
+        np.testing.assert_allclose(dimensions[i], world.max(axis=0) - world.min(axis=0))
+        np.testing.assert_allclose(centers[i], world.mean(axis=0))
+
+def test_world_bounds_empty():
+    centers, dimensions, mins, maxs = world_bounds(np.zeros((0, 8, 3)), np.zeros((0, 4, 4)))
+    assert centers.shape == dimensions.shape == mins.shape == maxs.shape == (0, 3)
+
+@pytest.mark.parametrize("cell", [None, 0.5, 3.0])
+def test_grid_index_within_matches_brute_force(cell):
+    rng = np.random.default_rng(2)
+    points = rng.uniform(0, 10, (500, 3))
+    grid = GridIndex(points, cell)
+    for point in rng.uniform(-2, 12, (50, 3)):
+        for radius in (0.3, 1.5, 6.0):
+            expected = np.flatnonzero(np.linalg.norm(points - point, axis=1) <= radius)
+            np.testing.assert_array_equal(np.sort(grid.within(point, radius)), expected)
+
+def test_grid_index_flat_points():
+    points = np.zeros((50, 3))
+    points[:, 1] = np.arange(50)
+    grid = GridIndex(points)
+    np.testing.assert_array_equal(np.sort(grid.within((0, 10.2, 0), 1.0)), [10, 11])
+
+@pytest.mark.parametrize("axes", [{'Z'}, {'-X'}, {'Y', '-Z'}, set(AXIS_DIRECTIONS)])
+def test_directional_nearest_matches_brute_force(axes):
+    rng = np.random.default_rng(3)
+    heads = rng.uniform(0, 10, (300, 3))
+    index = DirectionalBoneIndex(heads)
+    directions = np.array([AXIS_DIRECTIONS[axis] for axis in axes])
+    for point in rng.uniform(-1, 11, (40, 3)):
+        offsets = heads - point
+        allowed = np.flatnonzero((offsets @ directions.T > 1e-9).any(axis=1))
+        expected = int(allowed[np.argmin(np.linalg.norm(offsets[allowed], axis=1))]) if len(allowed) else None
+        assert index.nearest(point, axes) == expected
+
+@pytest.mark.parametrize("raised", [0, 3, 400])
+@pytest.mark.parametrize("axes", [{'Z'}, {'-Z', 'X'}])
+def test_directional_nearest_flat_layout_matches_brute_force(raised, axes):
+    # Bench-style grid on z=0, a few or many heads lifted off it
+    rng = np.random.default_rng(8)
+    heads = np.zeros((900, 3))
+    heads[:, 0] = np.arange(900) % 30 * 2.0
+    heads[:, 1] = np.arange(900) // 30 * 2.0
+    heads[rng.choice(900, raised, replace=False), 2] = rng.uniform(-5, 5, raised)
+    index = DirectionalBoneIndex(heads)
+    directions = np.array([AXIS_DIRECTIONS[axis] for axis in axes])
+    for point in heads[::37]:
+        offsets = heads - point
+        allowed = np.flatnonzero((offsets @ directions.T > 1e-9).any(axis=1))
+        expected = int(allowed[np.lexsort((allowed, np.linalg.norm(offsets[allowed], axis=1)))[0]]) if len(allowed) else None
+        assert index.nearest(point, axes) == expected
+
+def test_parent_by_axes_flat_layout_scales():
+    heads = np.zeros((20000, 3))
+    heads[:, 0] = np.arange(20000) % 141 * 2.0
+    heads[:, 1] = np.arange(20000) // 141 * 2.0
+    start = time.perf_counter()
+    parents = parent_by_axes(heads, len(heads), {'Z'})
+    # Nothing lies above a flat layout, every query ends at once instead of scanning every head
+    assert time.perf_counter() - start < 2.0
+    assert all(parent is None for parent in parents)
+
+def test_directional_nearest_accept_skips_rejected():
+    heads = np.array([(0.0, 1.0, 0.0), (0.0, 2.0, 0.0), (0.0, 3.0, 0.0)])
+    index = DirectionalBoneIndex(heads)
+    assert index.nearest((0, 0, 0), {'Y'}, accept=lambda i: i != 0) == 1
+    assert index.nearest((0, 0, 0), {'Y'}, accept=lambda i: False) is None
+    assert index.nearest((0, 5, 0), {'Y'}) is None
+
+def test_find_potential_parent_matches_brute_force():
+    rng = np.random.default_rng(4)
+    heads, tails = random_bones(rng, 300)
+    index = BoneSegmentIndex(heads, tails)
+    for child in range(len(heads)):
+        assert find_potential_parent(index, child) == brute_potential_parent(heads, tails, child)
+
+@pytest.mark.parametrize("axes", [None, {'Z', '-X'}])
+def test_plan_hierarchy_is_acyclic_and_respects_containment(axes):
+    rng = np.random.default_rng(5)
+    heads, tails = random_bones(rng, 400)
+    heads = np.concatenate(([(0.0, 0.0, 0.0)], heads))
+    tails = np.concatenate(([(0.0, 30.0, 0.0)], tails))
+    parents = plan_hierarchy(heads, tails, root=0, axes=axes)
+
+    assert parents[0] is None
+    assert all(parent is not None for parent in parents[1:])
+    assert_acyclic(parents)
+    lengths = np.linalg.norm(tails - heads, axis=1)
+    cutoff = lengths.max() * 36.0 / 100.0
+    contained = 0
+    for i in range(1, len(heads)):
+        if lengths[i] < cutoff:
+            expected = brute_potential_parent(heads, tails, i)
+            if expected is not None:
+                assert parents[i] == expected
+                contained += 1
+    assert contained
+
+def test_plan_hierarchy_manual_parent():
+    rng = np.random.default_rng(6)
+    heads, tails = random_bones(rng, 100)
+    heads = np.concatenate(([(0.0, 0.0, 0.0)], heads))
+    tails = np.concatenate(([(0.0, 30.0, 0.0)], tails))
+    parents = plan_hierarchy(heads, tails, root=0, parent=7)
+
+    assert_acyclic(parents)
+    assert parents[7] == 0
+    index = BoneSegmentIndex(heads, tails)
+    cutoff = index.lengths.max() * 36.0 / 100.0
+    for i in range(1, len(heads)):
+        if i == 7:
+            continue
+        contained = find_potential_parent(index, i) if index.lengths[i] < cutoff else None
+        assert parents[i] == (contained if contained is not None else 7)
+
+def test_plan_hierarchy_chains_by_y_without_axes():
+    heads = np.array([(0.0, y, 0.0) for y in (4.0, 0.0, 8.0)])
+    tails = heads + (0.0, 0.0, 10.0)
+    assert plan_hierarchy(heads, tails) == [1, None, 0]
+
+def test_parent_by_axes_is_acyclic():
+    rng = np.random.default_rng(7)
+    heads = rng.uniform(0, 10, (200, 3))
+    parents = parent_by_axes(heads, len(heads), set(AXIS_DIRECTIONS))
+    assert_acyclic(parents)
+    assert sum(parent is None for parent in parents) == 1
+
+def test_classify_sources():
+    records = {
+        "Same": ("Same_Bone", "a"),
+        "Moved": ("Moved_Bone", "b"),
+        "Gone": ("Gone_Bone", "c"),
+        "Lost": ("Deleted_Bone", "d"),
+    }
+    fingerprints = {"Same": "a", "Moved": "changed", "Lost": "d", "Free": "e", "Fresh": "f", "Taken": "g"}
+    bones = {"Same_Bone", "Moved_Bone", "Gone_Bone", "Free", "Taken"}
+    alive = {"Same", "Moved", "Lost", "Free", "Fresh"}
+    records["Taker"] = ("Taken", "h")
+    alive.add("Taker")
+
+    unchanged, changed, new, removed = classify_sources(records, fingerprints, bones, alive)
+    assert unchanged == ["Same"]
+    assert changed == {"Moved": "Moved_Bone", "Free": "Free"}
+    # Lost's bone was deleted and Taken's name belongs to another object's bone
+    assert sorted(new) == ["Fresh", "Lost", "Taken"]
+    assert removed == {"Gone": "Gone_Bone"}
+
+def test_plan_rig_places_new_bones_after_existing():
+    plan = rigplan.plan_rig(["Root"], [(0, 0, 0)], [(0, 10, 0)], 0, ["Part"],
+                            np.array([(1.0, 2.0, 3.0)]), np.array([(1.0, 2.0, 1.0)]), np.array([False]), np.eye(4))
+    assert plan.names == ["Root", "Part"]
+    assert plan.existing == 1 and plan.sources == ["Part"]
+    np.testing.assert_allclose(plan.tails[1] - plan.heads[1], (0, 2, 0))
+    assert plan.parents == [None, 0]